@@ -0,0 +1,66 @@
+"""
+Compares the per-invocation overhead of looking up a subcommand and binding its arguments, between the old path
+(get_subcommands and inspect.signature on every call) and the dispatch tables built at @Cog registration.
+
+Run from a bot folder (one with a config.json):
+
+    python benchmarks/bench_command_dispatch.py
+"""
+
+import inspect
+import timeit
+
+import discord
+
+from solon.bot import build_dispatch_table
+from solon.bot import Command
+from solon.bot import get_subcommands
+from solon.serialization import converter
+
+calls = 20000
+subcommand_count = 20
+
+IntConverter = converter(int)
+
+
+def make_cog_type():
+    async def subcommand(self, ctx, first: IntConverter, second: str, rest):
+        pass
+
+    attrs = {f"subcommand{i}": Command(name=f"subcommand{i}")(subcommand) for i in range(subcommand_count)}
+    return type("BenchmarkCog", (), attrs)
+
+
+def bind_before(cog_type, name, args):
+    subcommand = get_subcommands(cog_type)[name]
+    params = list(inspect.signature(subcommand.func).parameters.values())[2:]
+    bound = []
+    for i, param in enumerate(params):
+        converter = param.annotation() if param.annotation is not inspect.Parameter.empty else None
+        is_converter = isinstance(converter, discord.ext.commands.Converter)
+        bound.append((param.kind, is_converter, args[i]))
+    return bound
+
+
+def bind_after(dispatch_table, name, args):
+    subcommand = dispatch_table[name]
+    bound = []
+    for i, param in enumerate(subcommand.parameters):
+        bound.append((param.kind, param.converter is not None, args[i]))
+    return bound
+
+
+def main():
+    cog_type = make_cog_type()
+    dispatch_table = build_dispatch_table(get_subcommands(cog_type))
+    args = ("1", "two", "three")
+    name = f"subcommand{subcommand_count // 2}"
+
+    before = min(timeit.repeat(lambda: bind_before(cog_type, name, args), number=calls, repeat=5)) / calls
+    after = min(timeit.repeat(lambda: bind_after(dispatch_table, name, args), number=calls, repeat=5)) / calls
+    print(f"before: {before * 1e6:.2f} us per invocation")
+    print(f"after:  {after * 1e6:.2f} us per invocation ({before / after:.0f}x faster)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Compares load time, save time and file size of the database formats on a 100k-entry scoreboard.
+
+Run from a bot folder (one with a config.json):
+
+    python benchmarks/bench_database_formats.py
+"""
+
+import random
+import timeit
+
+from solon.encoding import decode
+from solon.encoding import encode
+from solon.encoding import formats
+
+entries = 100000
+repeats = 5
+
+
+def make_scoreboard():
+    rng = random.Random(0)
+    return {"scoreboard": {rng.randrange(10 ** 17, 10 ** 18): rng.randrange(0, 10 ** 6) for _ in range(entries)}}
+
+
+def main():
+    data = make_scoreboard()
+    print(f"{'format':<8} {'save (ms)':>10} {'load (ms)':>10} {'size (KiB)':>11}")
+    for format_name in formats:
+        blob = encode(data, format_name)
+        if decode(blob) != data:
+            raise AssertionError(f"{format_name} did not round trip.")
+
+        save_time = min(timeit.repeat(lambda: encode(data, format_name), number=1, repeat=repeats))
+        load_time = min(timeit.repeat(lambda: decode(blob), number=1, repeat=repeats))
+        print(f"{format_name:<8} {save_time * 1000:>10.1f} {load_time * 1000:>10.1f} {len(blob) / 1024:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
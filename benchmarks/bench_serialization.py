@@ -0,0 +1,95 @@
+"""
+Compares serializing and deserializing 10k-element SerializedLists and SerializedDictionaries between the old path
+(codex lookup and a SerializedData wrapper per element) and the codecs bound by compile_codec.
+
+Run from anywhere, serialization doesn't need a config.json:
+
+    python benchmarks/bench_serialization.py
+"""
+
+import ast
+import timeit
+
+from solon.serialization import get_codex
+from solon.serialization import serialize
+from solon.serialization import deserialize
+from solon.serialization import type_to_type_name
+from solon.serialization import SerializedData
+from solon.serialization import SerializedDictionary
+from solon.serialization import SerializedList
+
+element_count = 10000
+repeat = 5
+
+IntList = SerializedList(int)
+StrToInt = SerializedDictionary(str, int)
+
+
+def serialize_element_before(x_data, type_name):
+    if x_data is None:
+        return ""
+    return get_codex(type_name).codex_serialize(x_data)
+
+
+def deserialize_element_before(serialized_data, guild):
+    if serialized_data.value_serialized == "":
+        return None
+    codex = get_codex(serialized_data.type_name)
+    return codex.codex_deserialize_value(serialized_data.value_serialized, guild)
+
+
+def serialize_list_before(x_data):
+    return str([serialize_element_before(x, type_to_type_name(int)) for x in x_data])
+
+
+def deserialize_list_before(value_serialized):
+    deserialized_list = IntList()
+    for element_serialized in ast.literal_eval(value_serialized):
+        element_sd = SerializedData(value_serialized=element_serialized, type_name=type_to_type_name(int))
+        deserialized_list.append(deserialize_element_before(element_sd, None))
+    return deserialized_list
+
+
+def serialize_dict_before(x_data):
+    return str({serialize_element_before(k, type_to_type_name(str)): serialize_element_before(v, type_to_type_name(int))
+                for k, v in x_data.items()})
+
+
+def deserialize_dict_before(value_serialized):
+    deserialized_dict = StrToInt()
+    for k_ser, v_ser in ast.literal_eval(value_serialized).items():
+        k_sd = SerializedData(value_serialized=k_ser, type_name=type_to_type_name(str))
+        v_sd = SerializedData(value_serialized=v_ser, type_name=type_to_type_name(int))
+        deserialized_dict[deserialize_element_before(k_sd, None)] = deserialize_element_before(v_sd, None)
+    return deserialized_dict
+
+
+def report(name, before, after):
+    before = min(timeit.repeat(before, number=1, repeat=repeat))
+    after = min(timeit.repeat(after, number=1, repeat=repeat))
+    print(f"{name:<24} before {before * 1e3:7.2f} ms  after {after * 1e3:7.2f} ms  ({before / after:.1f}x)")
+
+
+def main():
+    int_list = IntList(range(element_count))
+    str_to_int = StrToInt()
+    for i in range(element_count):
+        str_to_int[f"key{i}"] = i
+
+    list_serialized = serialize(int_list, IntList.__name__)
+    dict_serialized = serialize(str_to_int, StrToInt.__name__)
+    assert deserialize(list_serialized, None) == int_list
+    assert deserialize(dict_serialized, None) == str_to_int
+
+    report("serialize list", lambda: serialize_list_before(int_list),
+           lambda: serialize(int_list, IntList.__name__))
+    report("deserialize list", lambda: deserialize_list_before(list_serialized.value_serialized),
+           lambda: deserialize(list_serialized, None))
+    report("serialize dictionary", lambda: serialize_dict_before(str_to_int),
+           lambda: serialize(str_to_int, StrToInt.__name__))
+    report("deserialize dictionary", lambda: deserialize_dict_before(dict_serialized.value_serialized),
+           lambda: deserialize(dict_serialized, None))
+
+
+if __name__ == "__main__":
+    main()
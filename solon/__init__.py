@@ -1,20 +1,54 @@
+import importlib
 import logging
 
+from .profiling import startup_tracer
+
+startup_tracer.install_import_hook(__name__)
+
 log = logging.getLogger(__name__)
 
+# Importing the package only loads the modules without side effects, so tools and tests that need serialization,
+# settings or the core helpers don't read config.json, touch the database folder or build a Bot. Everything else is
+# loaded by init(), which runs on first access to anything it provides (solon.Bot, solon.Cog, ...) if not called
+# explicitly.
+from .profiling import *
 from .core import *
 from .config import *
-from .logging import *
-
-log.info("Initializing core systems.")
-from .database import *
-from .timing import *
 from .emoji import *
 from .serialization import *
 from .settings import *
 
-log.info("Initializing bot.")
-from .bot import *
+deferred_modules = [
+    ("Initializing core systems.", ["logging", "database", "timing"]),
+    ("Initializing bot.", ["bot"]),
+    ("Initializing secondary systems.", ["scoreboards"]),
+]
+
+initialized = False
+
+
+def init():
+    global initialized
+    if initialized:
+        return
+    initialized = True
+
+    with startup_tracer.phase("solon.init"):
+        for message, module_names in deferred_modules:
+            log.info(message)
+            for module_name in module_names:
+                m = importlib.import_module(f"{__name__}.{module_name}")
+                for name in getattr(m, "__all__", []):
+                    globals()[name] = getattr(m, name)
+
+
+def __getattr__(name):
+    if name.startswith("__") and name != "__all__":
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-log.info("Initializing secondary systems.")
-from .scoreboards import *
+    init()
+    if name == "__all__":
+        return [k for k in globals() if not k.startswith("_")]
+    if name in globals():
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,12 +1,15 @@
+import asyncio
 import discord
 import inspect
 import logging
 import traceback
+import types
 
 from discord.ext.commands import Bot as BaseBotType
 
 from .core import CogNotFoundError
 from .core import copy_class
+from .core import share_class
 from .core import DynamicNameCollisionError
 from .core import InvalidArgumentsError
 from .core import MarkupError
@@ -19,9 +22,15 @@ from .core import forward_discord_py_cogs
 from .core import no_guild_id
 from .config import get_config
 from .database import get_data
+from .database import prefetching
+from .database import set_data_item
+from .database import unpin
+from .profiling import startup_tracer
 from .timing import start_timed_event_loop
 from .settings import create_settings
-from .settings import get_setting_value
+from .settings import get_settings_view
+from .settings import release_settings
+from .settings import settings_data_identifier
 
 __all__ = ["Bot", "Cog", "Command", "Event", "parse_identifier", "get_identifier", "check_permissions",
            "get_name_from_user_id", "get_member_or_user"]
@@ -33,13 +42,17 @@ log.info(f"Loading {__name__}")
 
 all_cog_types = {}
 
+# "copy_class" gives every guild its own copy of a cog's class. "shared" uses one class for all guilds and keeps
+# per-guild state on the instances only, which is much cheaper with many guilds.
+cog_instantiation = config.get("cog_instantiation", "copy_class")
+
 
 class Data:
     def __init__(self):
         self.active_cog_overrides = {}  # identifiers to bools
 
 
-data = get_data(__name__, lambda: Data())
+data = get_data(__name__, lambda: Data(), pin=True)
 
 
 def parse_identifier(identifier):
@@ -86,37 +99,32 @@ def get_member_or_user(guild_id, user_id):
 
 
 def get_name_from_user_id(guild_id, user_id):
-    global_settings_identifier = get_identifier("globals", guild_id)
-    name_format_has_nick = get_setting_value(global_settings_identifier, "name_format_has_nick")
-    name_format_no_nick = get_setting_value(global_settings_identifier, "name_format_no_nick")
-    name_decor_absent = get_setting_value(global_settings_identifier, "name_decor_absent")
-    name_decor_present = get_setting_value(global_settings_identifier, "name_decor_present")
-    name_unknown_user = get_setting_value(global_settings_identifier, "name_unknown_user")
+    settings = get_settings_view(get_identifier("globals", guild_id))
 
     guild = Bot.get_guild(guild_id)
     member = guild.get_member(user_id)
     if member:
         if member.nick:
-            name = name_format_has_nick.format(nick=member.nick, name=member.name, display_name=member.display_name)
+            name = settings.name_format_has_nick.format(nick=member.nick, name=member.name,
+                                                        display_name=member.display_name)
         else:
-            name = name_format_no_nick.format(name=member.name)
-        return name_decor_present.format(user=name)
+            name = settings.name_format_no_nick.format(name=member.name)
+        return settings.name_decor_present.format(user=name)
 
     else:
         user = Bot.get_user(user_id)
         if user:
-            name = name_format_no_nick.format(name=user.name)
+            name = settings.name_format_no_nick.format(name=user.name)
         else:
-            name = name_unknown_user.format(code=user_id % 10000)
-        return name_decor_absent.format(user=name)
+            name = settings.name_unknown_user.format(code=user_id % 10000)
+        return settings.name_decor_absent.format(user=name)
 
 
 async def check_permissions(ctx, perms, *, check=all):
     if ctx.author.guild_permissions.administrator:
         return True
 
-    global_settings_identifier = get_identifier("globals", ctx.guild.id)
-    use_commands = get_setting_value(global_settings_identifier, "use_commands")
+    use_commands = get_settings_view(get_identifier("globals", ctx.guild.id)).use_commands
     if use_commands is None:
         raise CommandError(
             "use_commands role is not set on this server. Nobody has permission to use commands until this is set.")
@@ -137,11 +145,12 @@ async def check_permissions(ctx, perms, *, check=all):
 
 def get_default_cogs(querying_guild_id=None):
     cogs_to_init = []
+    guild_ids = [g.id for g in Bot.guilds]
     # All default-active cogs
     for cog_type_name, cog_type in all_cog_types.items():
         if cog_type.default_active:
             if cog_type.guild_local:
-                guilds = [g.id for g in Bot.guilds]
+                guilds = guild_ids
             else:
                 guilds = [no_guild_id]
 
@@ -174,16 +183,78 @@ def Event():
                 cog = args[0]
                 guild_id = guild_event_codex[func.__name__](
                     args[1:])  # 1: because we want the codex to assume no self argument
-                gid = parse_identifier(cog.__class__.__name__)[1]
+                gid = parse_identifier(cog.identifier)[1]
                 if gid == guild_id:
                     return await func(*args)
 
         setattr(wrapped_func, "is_event", True)
+        setattr(wrapped_func, "event_func", func)
         return wrapped_func
 
     return wrapper
 
 
+class EventRouter:
+    # Receives each gateway event once, works out its guild once, and only calls the @Event listeners of cogs loaded
+    # for that guild (and of global cogs). Cogs loaded by load_cog don't register their @Event listeners with
+    # discord.py at all, so an event no longer fans out to every guild's copy of a cog.
+
+    def __init__(self):
+        self.listeners = {}  # event name -> guild id (None for global cogs) -> list of listeners
+        # Registered cog type -> names of its @Event listeners, which are also the event names. Keyed by the type in
+        # all_cog_types because each load may get a fresh copy of the class.
+        self.event_names_by_type = {}
+
+    def event_names(self, cog_type):
+        if cog_type not in self.event_names_by_type:
+            self.event_names_by_type[cog_type] = [name for name, member in inspect.getmembers(cog_type)
+                                                  if getattr(member, "is_event", False)]
+        return self.event_names_by_type[cog_type]
+
+    def add_cog(self, cog, guild_id):
+        for event_name in self.event_names(all_cog_types[parse_identifier(cog.identifier)[0]]):
+            if event_name not in self.listeners:
+                self.listeners[event_name] = {}
+                Bot.add_listener(self.create_dispatcher(event_name), event_name)
+
+            listener = getattr(type(cog), event_name).event_func.__get__(cog)
+            self.listeners[event_name].setdefault(guild_id, []).append(listener)
+
+        # Stop discord.py injecting listeners we route ourselves, in case they're also marked with Cog.listener
+        cog.__cog_listeners__ = [(name, method_name) for name, method_name in type(cog).__cog_listeners__
+                                 if hasattr(cog, method_name) and not hasattr(getattr(cog, method_name), "is_event")]
+
+    def remove_cog(self, cog, guild_id):
+        for event_name in self.event_names(all_cog_types[parse_identifier(cog.identifier)[0]]):
+            listeners = self.listeners[event_name].get(guild_id, [])
+            listeners[:] = [listener for listener in listeners if listener.__self__ is not cog]
+            if not listeners:
+                self.listeners[event_name].pop(guild_id, None)
+
+    def create_dispatcher(self, event_name):
+        listeners_by_guild = self.listeners[event_name]
+        get_guild_id = guild_event_codex.get(event_name, None)
+
+        async def dispatch(*args):
+            if get_guild_id is not None:
+                listeners = listeners_by_guild.get(get_guild_id(args), []) + listeners_by_guild.get(None, [])
+            else:
+                # We can't tell which guild this event belongs to, so only global cogs get it
+                listeners = listeners_by_guild.get(None, [])
+
+            results = await asyncio.gather(*(listener(*args) for listener in listeners), return_exceptions=True)
+            for listener, result in zip(listeners, results):
+                if isinstance(result, Exception):
+                    tb = "".join(traceback.format_tb(result.__traceback__))
+                    log.error(f"Error in {listener.__qualname__}.\n{tb}{result.__class__.__name__}: {result}")
+
+        dispatch.__name__ = event_name
+        return dispatch
+
+
+event_router = EventRouter()
+
+
 class CommandCog(discord.ext.commands.Cog):
     pass
 
@@ -202,6 +273,44 @@ def Command(name=None, **perms):
     return wrapper
 
 
+class CommandParameter:
+    # The annotation is instantiated when the parameter is first converted, not when the cog is registered, so it may
+    # depend on things that only exist once the bot is running. The instance is then reused for every call, so
+    # converters must keep any per-call state in the ctx they're given rather than on themselves.
+    def __init__(self, param):
+        self.name = param.name
+        self.kind = param.kind
+        self.annotation = param.annotation
+        self.converter_instantiated = param.annotation is inspect.Parameter.empty
+        self.converter_instance = None
+
+    @property
+    def converter(self):
+        if not self.converter_instantiated:
+            converter = self.annotation()
+            if isinstance(converter, discord.ext.commands.Converter):
+                self.converter_instance = converter
+            self.converter_instantiated = True
+        return self.converter_instance
+
+
+class CompiledSubcommand:
+    # Everything call_command needs to know about a subcommand, worked out once when the cog is registered
+    def __init__(self, subcommand):
+        self.fname = subcommand.fname
+        self.perms = subcommand.perms
+        self.func = subcommand.func
+        params = list(inspect.signature(subcommand.func).parameters.values())[2:]  # want to skip self & ctx
+        self.parameters = tuple(CommandParameter(param) for param in params)
+
+
+dispatch_tables = {}  # cog type name -> read-only mapping of subcommand name -> CompiledSubcommand
+
+
+def build_dispatch_table(subcommands):
+    return types.MappingProxyType({fname: CompiledSubcommand(sc) for fname, sc in subcommands.items()})
+
+
 def get_subcommands(cls):
     subcommands = {}
 
@@ -223,10 +332,9 @@ async def call_command(cls_name, ctx, *args):
         raise InvalidArgumentsError(f"No arguments given to {cls_name}.")
 
     cog_type = all_cog_types[cls_name]
-    subcommands = get_subcommands(cog_type)
     subcommand_name = args[0].lower()
     args = args[1:]
-    subcommand = subcommands.get(subcommand_name, None)
+    subcommand = dispatch_tables[cls_name].get(subcommand_name, None)
     if subcommand is None:
         raise InvalidArgumentsError(f"Argument {subcommand_name} did not correspond to a subcommand in {cls_name}.")
 
@@ -243,8 +351,7 @@ async def call_command(cls_name, ctx, *args):
     if cog is None:
         raise CogNotFoundError(f"Could not get cog {cls_name} for guild {ctx.guild}. Is it activated?")
 
-    signature = inspect.signature(subcommand.func)
-    params = list(signature.parameters.values())[2:]  # want to skip self & ctx
+    params = subcommand.parameters
     num_args = len(params)
 
     scargs = [cog, ctx]
@@ -255,12 +362,9 @@ async def call_command(cls_name, ctx, *args):
             break
 
         param = params[i]
-        annotation = param.annotation
         arg = args[0] if i != num_args - 1 else " ".join(args)
-        if annotation is not inspect.Parameter.empty:
-            converter = annotation()
-            if isinstance(converter, discord.ext.commands.Converter):
-                arg = await converter.convert(ctx, arg)
+        if param.converter is not None:
+            arg = await param.converter.convert(ctx, arg)
 
         if param.kind == inspect.Parameter.POSITIONAL_ONLY or param.kind == inspect.Parameter.POSITIONAL_OR_KEYWORD:
             scargs.append(arg)
@@ -312,9 +416,13 @@ def Cog(guild_local=True, guild_only=True, default_active=False, toggleable=True
         for name, value in l.items():
             setattr(cls, name, value)
 
+        if cog_instantiation == "shared":
+            share_class(cls, exclude=l.keys())
+
         all_cog_types[cls_name] = cls
 
         subcommands = get_subcommands(cls)
+        dispatch_tables[cls_name] = build_dispatch_table(subcommands)
         if len(subcommands) != 0:
             create_command(cls_name)
         return cls
@@ -322,23 +430,31 @@ def Cog(guild_local=True, guild_only=True, default_active=False, toggleable=True
     return wrapper
 
 
-def create_cog(cog_type):
-    identifier = cog_type.__name__
+def cog_data_identifier(identifier):
+    return f"{__name__}.cog.{identifier}"
+
+
+def create_cog(cog_type, identifier):
     guild_id = parse_identifier(identifier)[1]
 
     kwargs = {}
     if cog_type.data_type is not None:
-        kwargs["data"] = get_data(f"{__name__}.cog.{identifier}", lambda: cog_type.data_type())
+        kwargs["data"] = get_data(cog_data_identifier(identifier), lambda: cog_type.data_type(), pin=True)
     if cog_type.guild_local:
         kwargs["guild_id"] = guild_id
     if cog_type.default_settings is not None:
         kwargs["settings"] = create_settings(identifier, cog_type.default_settings, Bot.get_guild(guild_id))
-    cog = cog_type(**kwargs)
+
+    # identifier is set before __init__ runs, so it can already be used there (e.g. to start timed events). The cog
+    # name is set per instance because with shared classes the class name is the same for every guild.
+    cog = cog_type.__new__(cog_type, **kwargs)
     setattr(cog, "identifier", identifier)
+    setattr(cog, "__cog_name__", identifier)
+    cog.__init__(**kwargs)
     return cog
 
 
-async def load_cog(cog_type, guild_id):
+async def load_cog(cog_type, guild_id, *, guild_ids=None):
     if not cog_type.guild_local:
         guild_id = no_guild_id
     if cog_type.guild_local and guild_id == no_guild_id:
@@ -349,16 +465,22 @@ async def load_cog(cog_type, guild_id):
     if identifier in Bot.cogs:
         raise DynamicNameCollisionError(f"That cog is already active.")
 
-    if guild_id == no_guild_id or guild_id in [g.id for g in Bot.guilds]:
+    if guild_ids is None:
+        guild_ids = {g.id for g in Bot.guilds}
+
+    if guild_id == no_guild_id or guild_id in guild_ids:
         log.info(f"Loading {identifier}.")
         cog_type = all_cog_types[cog_type_name]
 
-        new_cog_type = copy_class(cog_type, class_name=identifier)
-        cog = create_cog(new_cog_type)
+        if cog_instantiation == "shared":
+            cog = create_cog(cog_type, identifier)
+        else:
+            cog = create_cog(copy_class(cog_type, class_name=identifier), identifier)
         setattr(cog, "active", True)
+        event_router.add_cog(cog, guild_id if cog_type.guild_local else None)
         Bot.add_cog(cog)
 
-        data.active_cog_overrides[identifier] = True
+        set_data_item(data, "active_cog_overrides", identifier, True)
     else:
         log.warning(f"Not loading {identifier} because we aren't in that guild.")
 
@@ -366,10 +488,15 @@ async def load_cog(cog_type, guild_id):
 async def unload_cog(identifier):
     if identifier in Bot.cogs:
         log.info(f"Unloading {identifier}.")
-        data.active_cog_overrides[identifier] = False
+        set_data_item(data, "active_cog_overrides", identifier, False)
 
         cog = Bot.get_cog(identifier)
         cog.active = False
+        event_router.remove_cog(cog, parse_identifier(identifier)[1] if cog.guild_local else None)
+        if cog.data_type is not None:
+            unpin(cog_data_identifier(identifier))
+        if cog.default_settings is not None:
+            release_settings(identifier)
         del cog
         Bot.remove_cog(identifier)
     else:
@@ -377,13 +504,54 @@ async def unload_cog(identifier):
 
 
 def get_cogs_to_load(guild_id=None):
-    cogs_to_load = get_default_cogs(guild_id)
+    cogs_to_load = dict.fromkeys(get_default_cogs(guild_id))  # ordered set
     for identifier, enabled in data.active_cog_overrides.items():
-        if enabled and identifier not in cogs_to_load:
-            cogs_to_load.append(identifier)
-        elif not enabled and identifier in cogs_to_load:
-            cogs_to_load.remove(identifier)
-    return cogs_to_load
+        if guild_id is not None and parse_identifier(identifier)[1] != guild_id:
+            continue
+        if enabled:
+            cogs_to_load[identifier] = None
+        else:
+            cogs_to_load.pop(identifier, None)
+    return list(cogs_to_load)
+
+
+async def load_cogs(identifiers):
+    # Loads many cogs at once: the guild list is only built once, and all their data is read from the database
+    # concurrently before any cog is constructed. Returns how long each phase took, in seconds.
+    timings = {}
+
+    with startup_tracer.phase("load_cogs.resolve") as phase:
+        guild_ids = {g.id for g in Bot.guilds}
+        cogs_by_guild = {}
+        for identifier in identifiers:
+            cog_type_name, guild_id = parse_identifier(identifier)
+            if cog_type_name not in all_cog_types:
+                raise CogNotFoundError(
+                    f"Could not find cog {cog_type_name}, but it's marked as active in the database.")
+            cogs_by_guild.setdefault(guild_id, []).append(all_cog_types[cog_type_name])
+    timings["resolve"] = phase.duration
+
+    with prefetching() as prefetch:
+        with startup_tracer.phase("load_cogs.prefetch") as phase:
+            data_identifiers = []
+            for identifier in identifiers:
+                cog_type = all_cog_types[parse_identifier(identifier)[0]]
+                if cog_type.data_type is not None:
+                    data_identifiers.append(cog_data_identifier(identifier))
+                if cog_type.default_settings is not None:
+                    data_identifiers.append(settings_data_identifier(identifier))
+            await Bot.loop.run_in_executor(None, prefetch, data_identifiers)
+        timings["prefetch"] = phase.duration
+
+        with startup_tracer.phase("load_cogs.instantiate") as phase:
+            for guild_id, cog_types in cogs_by_guild.items():
+                for cog_type in cog_types:
+                    await load_cog(cog_type, guild_id, guild_ids=guild_ids)
+        timings["instantiate"] = phase.duration
+
+    log.info(f"Loaded {len(identifiers)} cogs in {len(cogs_by_guild)} guilds. Time taken: "
+             + ", ".join(f"{name} {seconds:.3f}s" for name, seconds in timings.items()))
+    return timings
 
 
 class AliasCog(discord.ext.commands.Cog):
@@ -416,44 +584,41 @@ class CentralCog(discord.ext.commands.Cog):
     async def on_guild_join(guild):
         cogs_to_load = get_cogs_to_load(guild.id)
         log.info(f"Bot joined guild {guild}. Loading the following cogs: {cogs_to_load}")
-        for identifier in cogs_to_load:
-            cog_type_name, guild_id = parse_identifier(identifier)
-            cog_type = all_cog_types[cog_type_name]
-            await load_cog(cog_type, guild_id)
+        await load_cogs(cogs_to_load)
 
     @staticmethod
     @discord.ext.commands.Cog.listener()
     async def on_guild_remove(guild):
         log.info(f"Bot has left {guild} - disabling cogs.")
-        guild_cogs = [cog.__name__ for cog in Bot.cogs if parse_identifier(cog.__name__)[1] == guild.id]
+        guild_cogs = [identifier for identifier in Bot.cogs if parse_identifier(identifier)[1] == guild.id]
         for identifier in guild_cogs:
             await unload_cog(identifier)
 
             # Set data to true so we have a record of which cogs were active, in case the bot comes back
-            data.active_cog_overrides[identifier] = True
+            set_data_item(data, "active_cog_overrides", identifier, True)
 
     @staticmethod
     @discord.ext.commands.Cog.listener()
     async def on_ready():
-        if config["disable_help"]:
-            Bot.remove_command("help")
-        Bot.add_cog(CommandCog())
-
-        cogs_to_load = get_cogs_to_load()
-        log.info(f"Bot ready.")
-        log.info(f"Connected to the following servers: {[g.name for g in Bot.guilds]}")
-        log.info(f"Loading the following cogs: {cogs_to_load}")
-        for identifier in cogs_to_load:
-            cog_type_name, guild_id = parse_identifier(identifier)
-            if cog_type_name not in all_cog_types:
-                raise CogNotFoundError(
-                    f"Could not find cog {cog_type_name}, but it's marked as active in the database.")
-            cog_type = all_cog_types[cog_type_name]
-            await load_cog(cog_type, guild_id)
-
-        setup_aliases()
-
-        start_timed_event_loop(Bot.loop)
+        try:
+            with startup_tracer.phase("on_ready"):
+                if config["disable_help"]:
+                    Bot.remove_command("help")
+                Bot.add_cog(CommandCog())
+
+                cogs_to_load = get_cogs_to_load()
+                log.info(f"Bot ready.")
+                log.info(f"Connected to the following servers: {[g.name for g in Bot.guilds]}")
+                log.info(f"Loading the following cogs: {cogs_to_load}")
+                await load_cogs(cogs_to_load)
+
+                with startup_tracer.phase("setup_aliases"):
+                    setup_aliases()
+
+                start_timed_event_loop(Bot.loop)
+        finally:
+            # Also uninstalls the import hook, which mustn't outlive startup even if it failed
+            startup_tracer.finish()
 
     @staticmethod
     async def has_permission(ctx, cog_type):
@@ -7,11 +7,15 @@ log.info(f"Loading {__name__}")
 
 __all__ = ["get_config"]
 
-with open("config.json") as f:
-    config = json.load(f)
+config = None  # read from config.json the first time it's needed
 
 
 def get_config(name):
+    global config
+    if config is None:
+        with open("config.json") as f:
+            config = json.load(f)
+
     if name in config:
         return config[name]
     else:
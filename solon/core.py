@@ -12,7 +12,7 @@ import importlib
 import logging
 import re
 
-__all__ = ["copy_class", "CogNotFoundError", "DynamicNameCollisionError", "IncorrectSignatureError",
+__all__ = ["copy_class", "share_class", "CogNotFoundError", "DynamicNameCollisionError", "IncorrectSignatureError",
            "InvalidArgumentsError", "MarkupError", "NamingConventionError",
            "NoPermissionsError", "NotACoroutineError", "SocratesError", "SocratesRuntimeError", "SocratesStaticError",
            "StaticNameCollisionError", "TestFailureError",
@@ -97,6 +97,7 @@ forward_discord_py_cogs = []
 
 
 def get_bot():
+    importlib.import_module("solon").init()
     m = importlib.import_module("solon.bot")
     return m.Bot
 
@@ -121,6 +122,35 @@ def copy_class(cls, class_name=None):
     return copy_cls
 
 
+class LazyCopy:
+    # Non-data descriptor standing in for a mutable class attribute. The first time an instance reads it, the instance
+    # gets its own deep copy, which from then on shadows the descriptor. Assigning never needs a copy at all.
+    def __init__(self, name, value):
+        self.name = name
+        self.value = value
+
+    def __get__(self, instance, owner):
+        if instance is None:
+            return self.value
+        value = copy.deepcopy(self.value)
+        instance.__dict__[self.name] = value
+        return value
+
+
+def share_class(cls, exclude=()):
+    # The alternative to copy_class: instances share cls, and the mutable class attributes copy_class would have
+    # deep copied are only copied per instance when that instance uses them.
+    for attr_name, attr in list(cls.__dict__.items()):
+        if attr_name.startswith("__") or attr_name in exclude or isinstance(attr, LazyCopy):
+            continue
+        try:
+            hash(attr)
+        except TypeError:
+            # Same assumption as copy_class
+            setattr(cls, attr_name, LazyCopy(attr_name, attr))
+    return cls
+
+
 def timedelta_from_string(string):
     string = string.lower()
     total_seconds = decimal.Decimal("0")
@@ -1,31 +1,115 @@
+import asyncio
+import collections
+import concurrent.futures
+import contextlib
+import copy
 import logging
-import os
-import pprint
-import ast
+import hashlib
+import itertools
+import pickle
+import threading
 
 from .config import get_config
-from .core import SocratesStaticError
 from .core import timedelta_from_string
+from .encoding import decode
+from .encoding import encode
+from .encoding import get_format
+from .journal import Journal
+from .storage import parse_backend
 
-__all__ = ["get_data", "save_all", "save_interval"]
+__all__ = ["get_data", "pin", "unpin", "save_all", "save_all_async", "save_interval", "set_data_attribute",
+           "set_data_item", "del_data_item"]
 
 log = logging.getLogger(__name__)
-config = get_config(__name__)
 
 log.info(f"Loading {__name__}")
 
-db = {}
-db_folder = config["folder_name"]
-enabled = config["enabled"]
-save_interval = timedelta_from_string(config["save_interval"])
+# Everything that depends on config is set up by initialize() when the database is first used, so that importing
+# this module (e.g. through settings) doesn't read config.json or touch the disk.
+initialized = False
+config = None
+db_folder = None
+enabled = None
+backend = None
+save_format = None
+max_resident_objects = None  # None keeps everything in memory forever
+journal = None
+journal_compact_bytes = None
+prefetch_threads = None
 
-if not os.path.exists(db_folder):
-    os.mkdir(db_folder)
 
-if not os.path.isdir(db_folder):
-    raise SocratesStaticError(f"os.path.isdir failed on folder {db_folder}.")
+def initialize():
+    global initialized, config, db_folder, enabled, save_interval, backend, save_format, max_resident_objects
+    global journal, journal_compact_bytes, prefetch_threads
+    if initialized:
+        return
+
+    config = get_config(__name__)
+    db_folder = config["folder_name"]
+    enabled = config["enabled"]
+    save_interval = timedelta_from_string(config["save_interval"])
+    backend = parse_backend(db_folder, config.get("backend", {"flat_file": {}}))
+    save_format = config.get("format", "pprint")
+    get_format(save_format)  # fail early on typos rather than at the first save
+    max_resident_objects = config.get("max_resident_objects", None)
+
+    if enabled and config.get("journal", False):
+        journal = Journal(config.get("journal_filename", f"{db_folder}.journal"), config.get("journal_fsync", False))
+    journal_compact_bytes = config.get("journal_compact_bytes", 16 * 1024 * 1024)
+    prefetch_threads = config.get("prefetch_threads", 8)
+
+    initialized = True
+
+
+def __getattr__(name):
+    # save_interval is exported, but only known once config has been read
+    if name == "save_interval":
+        initialize()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
 
+db = collections.OrderedDict()  # least recently used first
 pre_save_all_callbacks = []
+saved_digests = {}  # identifier -> digest of the representation as it was last written or loaded
+pin_counts = {}  # identifier -> number of holders that need the object to stay resident
+pinned_resident_count = 0  # how many objects in db are pinned
+pending_evictions = {}  # identifier -> encoded object that was evicted but is still waiting to be written
+pending_evictions_lock = threading.Lock()  # pending_evictions is also used by save_executor and prefetch threads
+prefetched_blobs = {}  # identifier -> encoded object read by prefetch, waiting for get_data
+identifiers_by_object = {}  # id(data) -> identifier, for every object in db
+unreplayed_records = None  # identifier -> journal records not yet applied to a loaded object
+compaction_scheduled = False
+
+
+class CacheStats:
+    def __init__(self):
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __str__(self):
+        return f"{self.hits} hits, {self.misses} misses, {self.evictions} evictions"
+
+
+cache_stats = CacheStats()
+
+
+class SaveMetrics:
+    def __init__(self, total_count=0):
+        self.total_count = total_count
+        self.dirty_count = 0
+        self.bytes_written = 0
+
+    def __str__(self):
+        return f"{self.dirty_count}/{self.total_count} objects dirty, {self.bytes_written} bytes written"
+
+
+last_save_metrics = SaveMetrics()
+
+# A single worker keeps saves ordered; save_all_async additionally waits for the previous save to finish.
+save_executor = concurrent.futures.ThreadPoolExecutor(max_workers=1, thread_name_prefix=__name__)
+save_lock = None
 
 
 def pre_save_all(func):
@@ -33,43 +117,376 @@ def pre_save_all(func):
     return func
 
 
-def get_data(identifier, create):
+def get_data(identifier, create, *, pin=False):
+    # Unpinned objects may be evicted when there are more than max_resident_objects in memory, so only hold on to
+    # the returned object if it's pinned. Holders that pin must unpin when they let go of it.
+    global pinned_resident_count
+    initialize()
+    if pin:
+        add_pin(identifier)
+
     if identifier in db:
+        cache_stats.hits += 1
+        db.move_to_end(identifier)
         return db[identifier]
 
     else:
+        cache_stats.misses += 1
         data = create()
-        try:
-            path = os.path.join(db_folder, identifier)
-            with open(path) as f:
-                v = ast.literal_eval(f.read())
-                for key, value in v.items():
+        with pending_evictions_lock:
+            blob = pending_evictions.get(identifier)
+        if blob is None:
+            blob = prefetched_blobs.pop(identifier, None)
+        if blob is None:
+            blob = backend.load(identifier)
+        if blob is not None:
+            v = decode(blob)
+            for key, value in v.items():
+                current = getattr(data, key, None)
+                if type(value) is dict and isinstance(current, dict) and type(current) is not dict:
+                    # Keep dict subclasses set up by create, like a RankedScoreboard, and load the saved items into them
+                    current.clear()
+                    current.update(value)
+                else:
                     data.__setattr__(key, value)
-        except FileNotFoundError as e:
+            saved_digests[identifier] = snapshot_digest(representation_of(data))
+        else:
             log.warning(f"Data file with identifier {identifier} not found. This may not be a problem on a fresh run.")
 
+        if journal is not None:
+            # Applied after the digest is taken, so the next save writes the replayed state into the snapshot
+            for record in get_unreplayed_records().pop(identifier, []):
+                apply_record(data, record)
+
         db[identifier] = data
+        identifiers_by_object[id(data)] = identifier
+        if identifier in pin_counts:
+            pinned_resident_count += 1
+        evict_over_budget()
         return data
 
 
-def save_all():
+def get_unreplayed_records():
+    global unreplayed_records
+    if unreplayed_records is None:
+        unreplayed_records = {}
+        for identifier, *record in journal.read_records():
+            unreplayed_records.setdefault(identifier, []).append(tuple(record))
+        if unreplayed_records:
+            log.info(f"Found journal records for {len(unreplayed_records)} objects.")
+    return unreplayed_records
+
+
+def apply_record(data, record):
+    operation, name, *args = record
+    try:
+        if operation == "set":
+            setattr(data, name, args[0])
+        elif operation == "set_item":
+            getattr(data, name)[args[0]] = args[1]
+        elif operation == "del_item":
+            getattr(data, name).pop(args[0], None)
+    except Exception as e:
+        log.error(f"Could not replay journal record {record}: {e}")
+
+
+def set_data_attribute(data, name, value):
+    # Like setattr, but recorded in the journal (if enabled) so it survives a crash before the next save. data must
+    # come from get_data and value must be something ast.literal_eval can read back.
+    setattr(data, name, value)
+    record_mutation(data, ("set", name, value))
+
+
+def set_data_item(data, name, key, value):
+    getattr(data, name)[key] = value
+    record_mutation(data, ("set_item", name, key, value))
+
+
+def del_data_item(data, name, key):
+    del getattr(data, name)[key]
+    record_mutation(data, ("del_item", name, key))
+
+
+def record_mutation(data, record):
+    if journal is None:
+        return
+
+    identifier = identifiers_by_object.get(id(data))
+    if identifier is None:
+        log.warning(f"Not journaling {record} because the object didn't come from get_data.")
+        return
+
+    journal.append((identifier,) + record)
+    if journal.bytes_written > journal_compact_bytes:
+        schedule_compaction()
+
+
+def schedule_compaction():
+    global compaction_scheduled
+    if compaction_scheduled or not asyncio.get_event_loop().is_running():
+        return
+
+    async def compact():
+        global compaction_scheduled
+        try:
+            await save_all_async()
+        finally:
+            compaction_scheduled = False
+
+    compaction_scheduled = True
+    asyncio.ensure_future(compact())
+
+
+def rotate_journal():
+    # Called right before taking a snapshot. Records for objects that aren't loaded won't be in the snapshot, so
+    # they're carried over into the new segment. Returns the last segment the snapshot makes redundant.
+    if journal is None:
+        return None
+
+    records = get_unreplayed_records()
+    segment = journal.rotate()
+    for identifier, identifier_records in records.items():
+        for record in identifier_records:
+            journal.append((identifier,) + record)
+    return segment
+
+
+def finish_compaction(segment, snapshot, written_digests):
+    # Safe to call from a worker thread, after the snapshot and any evicted objects have been written
+    if segment is None:
+        return
+    with pending_evictions_lock:
+        evictions_pending = bool(pending_evictions)
+    if len(written_digests) != len(snapshot) or evictions_pending:
+        log.warning(f"Keeping journal segments up to {segment} because the snapshot wasn't fully written.")
+        return
+    journal.delete_through(segment)
+
+
+def prefetch(identifiers):
+    # Reads objects that aren't loaded yet concurrently, so the get_data calls that follow don't wait on the backend
+    # one at a time. Safe to call from a worker thread. Returns the identifiers of the objects that were found.
+    initialize()
+    with pending_evictions_lock:
+        identifiers = [identifier for identifier in identifiers
+                       if identifier not in db and identifier not in pending_evictions]
+    found = []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=prefetch_threads) as executor:
+        for identifier, blob in zip(identifiers, executor.map(backend.load, identifiers)):
+            if blob is not None:
+                prefetched_blobs[identifier] = blob
+                found.append(identifier)
+    return found
+
+
+def clear_prefetched(identifiers=None):
+    if identifiers is None:
+        prefetched_blobs.clear()
+    for identifier in identifiers or ():
+        prefetched_blobs.pop(identifier, None)
+
+
+@contextlib.contextmanager
+def prefetching():
+    # Yields a prefetch function whose blobs are dropped on exit, even after an error, if get_data hasn't used them.
+    # Only those blobs are dropped, so concurrent users don't clear each other's.
+    prefetched = []
+
+    def prefetch_in_scope(identifiers):
+        found = prefetch(identifiers)
+        prefetched.extend(found)
+        return found
+
+    try:
+        yield prefetch_in_scope
+    finally:
+        clear_prefetched(prefetched)
+
+
+def pin(identifier):
+    add_pin(identifier)
+
+
+def add_pin(identifier):
+    global pinned_resident_count
+    pin_counts[identifier] = pin_counts.get(identifier, 0) + 1
+    if pin_counts[identifier] == 1 and identifier in db:
+        pinned_resident_count += 1
+
+
+def unpin(identifier):
+    global pinned_resident_count
+    count = pin_counts.get(identifier, 0) - 1
+    if count > 0:
+        pin_counts[identifier] = count
+    elif pin_counts.pop(identifier, None) is not None:
+        if identifier in db:
+            pinned_resident_count -= 1
+        evict_over_budget()
+
+
+def evict_over_budget():
+    # When saving is disabled, evicting would lose data for good
+    if not enabled or max_resident_objects is None or len(db) <= max_resident_objects:
+        return
+
+    if pinned_resident_count >= len(db):
+        # Everything in memory is pinned, so there's nothing to evict
+        return
+
+    unpinned = (identifier for identifier in db if identifier not in pin_counts)
+    for identifier in list(itertools.islice(unpinned, len(db) - max_resident_objects)):
+        evict(identifier)
+
+
+def evict(identifier):
+    data = db.pop(identifier)
+    prefetched_blobs.pop(identifier, None)
+    del identifiers_by_object[id(data)]
+    v = representation_of(data)
+    if saved_digests.pop(identifier, None) != snapshot_digest(v):
+        # Written on save_executor so it can't be overtaken by an older snapshot from a save that's still running.
+        # Until then, get_data reads it from pending_evictions.
+        blob = encode(v, save_format, int(config["line_width"]))
+        with pending_evictions_lock:
+            pending_evictions[identifier] = blob
+        save_executor.submit(store_evicted, identifier, blob)
+
+    cache_stats.evictions += 1
+    log.debug(f"Evicted {identifier} from memory ({cache_stats}).")
+
+
+def store_evicted(identifier, blob):
+    try:
+        backend.store_many({identifier: blob})
+    except Exception as e:
+        log.error(f"Could not save evicted object {identifier}: {e}")
+        return
+
+    with pending_evictions_lock:
+        if pending_evictions.get(identifier) is blob:
+            del pending_evictions[identifier]
+
+
+def representation_of(data):
+    return vars(data) if hasattr(data, "__dict__") else data
+
+
+def snapshot_digest(v):
+    # repr is far cheaper than pformat, so we use it to find out whether an object changed since it was last
+    # written. Objects whose repr isn't stable (e.g. contains memory addresses) just always look dirty.
+    return hashlib.blake2b(repr(v).encode("utf-8"), digest_size=16).digest()
+
+
+def run_pre_save_callbacks():
     log.info(f"Calling pre-save callbacks.")
     for func in pre_save_all_callbacks:
         func()
 
+
+def log_disabled_save():
+    rep = {identifier: representation_of(data) for identifier, data in db.items()}
+    rep_str = "\n".join([f"{k}\n{v}\n" for k, v in rep.items()])
+    log.info(f"Saving is disabled. Database looks like:\n{rep_str}")
+
+
+def take_snapshot(*, frozen):
+    # Returns (identifier, value, digest) for every dirty object. When frozen, values are pickled so they can be
+    # written from another thread while the original objects keep being mutated.
+    snapshot = []
+    for identifier, data in db.items():
+        v = representation_of(data)
+        digest = snapshot_digest(v)
+        if saved_digests.get(identifier) == digest:
+            continue
+
+        if frozen:
+            try:
+                v = pickle.dumps(v, protocol=pickle.HIGHEST_PROTOCOL)
+            except Exception:
+                v = copy.deepcopy(v)
+        snapshot.append((identifier, v, digest))
+    return snapshot
+
+
+def thaw(v):
+    return pickle.loads(v) if isinstance(v, bytes) else v
+
+
+def write_snapshot(snapshot, metrics):
+    # Safe to call from a worker thread. Every dirty object goes to the backend in one batch. Returns the digests
+    # that were successfully written.
+    blobs = {}
+    digests = {}
+    for identifier, v, digest in snapshot:
+        try:
+            blobs[identifier] = encode(thaw(v), save_format, int(config["line_width"]))
+            digests[identifier] = digest
+        except Exception as e:
+            log.error(f"Could not save {identifier}: {e}")
+
+    try:
+        backend.store_many(blobs)
+    except Exception as e:
+        log.error(f"Could not save {len(blobs)} objects: {e}")
+        return {}
+
+    metrics.dirty_count += len(blobs)
+    metrics.bytes_written += sum(len(blob) for blob in blobs.values())
+    return digests
+
+
+def save_all():
+    initialize()
+    run_pre_save_callbacks()
+
     if not enabled:
-        rep = {identifier: vars(data) if hasattr(data, "__dict__") else data for identifier, data in db.items()}
-        rep_str = "\n".join([f"{k}\n{v}\n" for k, v in rep.items()])
-        log.info(f"Saving is disabled. Database looks like:\n{rep_str}")
+        log_disabled_save()
         return
 
     log.info(f"Saving {len(db)} objects to {db_folder}.")
 
-    for identifier, data in db.items():
-        if hasattr(data, "__dict__"):
-            v = vars(data)
-        else:
-            v = data
-        with open(f"{db_folder}/{identifier}", "w") as f:
-            print(pprint.pformat(v, width=int(config["line_width"])), file=f)
-    log.info("Save finished.")
+    global last_save_metrics
+    metrics = SaveMetrics(len(db))
+    segment = rotate_journal()
+    snapshot = take_snapshot(frozen=False)
+    # Still written on save_executor, behind any evicted objects queued there, so a queued eviction can't overwrite
+    # what this writes and the two never touch the backend at once. Blocking here keeps the snapshot from changing.
+    written_digests = save_executor.submit(write_snapshot, snapshot, metrics).result()
+    saved_digests.update(written_digests)
+    save_executor.submit(finish_compaction, segment, snapshot, written_digests).result()
+
+    last_save_metrics = metrics
+    log.info(f"Save finished: {metrics}.")
+    return metrics
+
+
+async def save_all_async():
+    # Callbacks and the snapshot run on the event loop so they see a consistent database; formatting and file I/O
+    # run on save_executor. If the previous save hasn't finished yet, this waits for it before starting.
+    global save_lock
+    if save_lock is None:
+        save_lock = asyncio.Lock()
+
+    initialize()
+    async with save_lock:
+        run_pre_save_callbacks()
+
+        if not enabled:
+            log_disabled_save()
+            return
+
+        log.info(f"Saving {len(db)} objects to {db_folder} in the background.")
+
+        global last_save_metrics
+        metrics = SaveMetrics(len(db))
+        segment = rotate_journal()
+        snapshot = take_snapshot(frozen=True)
+        loop = asyncio.get_event_loop()
+        written_digests = await loop.run_in_executor(save_executor, write_snapshot, snapshot, metrics)
+        saved_digests.update(written_digests)
+        await loop.run_in_executor(save_executor, finish_compaction, segment, snapshot, written_digests)
+
+        last_save_metrics = metrics
+        log.info(f"Background save finished: {metrics}.")
+        return metrics
@@ -3,6 +3,7 @@ import logging
 
 from .core import SocratesRuntimeError
 from .core import get_bot
+from .lookup import get_guild_emoji
 
 log = logging.getLogger(__name__)
 
@@ -14,11 +15,18 @@ class EmojiError(SocratesRuntimeError):
 
 
 class Emoji:
+    # A value type: custom emojis are equal when their ids are, unicode emojis when their names are. Also compares
+    # equal to the discord.Emoji of a custom emoji and the str of a unicode emoji, and hashes the same as those.
+    # discord.Emoji.__eq__ only knows about discord.py's own emoji types, so emoji == discord_emoji holds but
+    # discord_emoji == emoji doesn't - keep the Emoji on the left, or use emoji_equals which does that for you.
+    # discord.PartialEmoji isn't supported, it hashes by (id, name).
+    __slots__ = ("guild_id", "name", "id", "animated")
+
     def __init__(self, guild_id, name, id=None, animated=False):
         self.guild_id = guild_id
         self.name = name
         self.id = id
-        self.animated = False
+        self.animated = animated
 
     def is_custom_emoji(self):
         return self.id is not None
@@ -33,13 +41,30 @@ class Emoji:
         else:
             guild = get_bot().get_guild(self.guild_id)
             if guild:
-                for emoji in guild.emojis:
-                    if emoji.id == self.id:
-                        return emoji
+                emoji = get_guild_emoji(guild, self.id)
+                if emoji is not None:
+                    return emoji
 
         log.warning(f"Could not get discord.py emoji for {self}.")
         return None
 
+    def __eq__(self, other):
+        if isinstance(other, (Emoji, discord.Emoji)):
+            if self.is_custom_emoji():
+                return self.id == other.id
+            return other.id is None and self.name == other.name
+        if isinstance(other, str):
+            return self.is_unicode_emoji() and self.name == other
+        return NotImplemented
+
+    def __hash__(self):
+        if self.is_custom_emoji():
+            return self.id >> 22  # same as discord.Emoji
+        return hash(self.name)
+
+    def __repr__(self):
+        return f"Emoji(guild_id={self.guild_id!r}, name={self.name!r}, id={self.id!r}, animated={self.animated!r})"
+
     def __str__(self):
         if self.id is None:
             return self.name
@@ -49,29 +74,11 @@ class Emoji:
 
 
 def emoji_equals(lhs, rhs):
-    # At least one arg (preferably lhs) must be an Emoji
+    # At least one arg must be an Emoji
     if not isinstance(lhs, Emoji) and not isinstance(rhs, Emoji):
         raise EmojiError(f"Wrong emoji comparison.")
 
-    # We assume from here that lhs is an Emoji, rhs might not be
-    # if this isn't the case but it can work the other way, we
-    # just swap arguments
-    if not isinstance(lhs, Emoji):  # we know rhs is an Emoji
-        return emoji_equals(rhs, lhs)
-
-    if isinstance(rhs, Emoji):
-        # Both Emojis
-        if lhs.is_custom_emoji() and rhs.is_custom_emoji():
-            return lhs.id == rhs.id
-        elif lhs.is_unicode_emoji() and rhs.is_unicode_emoji():
-            return lhs.name == lhs.name
-
-    elif isinstance(rhs, str):
-        # Comparing lhs to a unicode emoji
-        return lhs.name == rhs
-
-    elif isinstance(rhs, discord.Emoji):
-        # Comparing lhs to a custom emoji
-        return lhs.id == rhs.id
-
-    return False
+    # Emoji.__eq__ is the one that knows how to compare with discord.Emoji
+    if not isinstance(lhs, Emoji):
+        lhs, rhs = rhs, lhs
+    return lhs == rhs
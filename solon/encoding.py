@@ -0,0 +1,123 @@
+import ast
+import json
+import pickle
+import pprint
+
+from .core import SocratesRuntimeError
+
+__all__ = []
+
+# Files in any format but pprint start with a header naming the format, so they're recognised on load. pprint files
+# have no header, which keeps them readable by older versions (and a header would be a comment to literal_eval anyway).
+header_prefix = b"#solon-format "
+format_version = 1
+pickle_protocol = min(5, pickle.HIGHEST_PROTOCOL)
+
+
+class EncodingError(SocratesRuntimeError):
+    pass
+
+
+formats = {}
+
+
+def Format(name):
+    def wrapper(cls):
+        formats[name] = cls
+        return cls
+
+    return wrapper
+
+
+@Format("pprint")
+class PprintFormat:
+    @staticmethod
+    def encode(v, line_width):
+        return (pprint.pformat(v, width=line_width) + "\n").encode("utf-8")
+
+    @staticmethod
+    def decode(body):
+        return ast.literal_eval(body.decode("utf-8"))
+
+
+json_tags = ("__int_keys__", "__items__", "__tuple__", "__set__")
+
+
+def to_json_compatible(v):
+    # JSON only has str keys, lists and no sets, so anything else is tagged and restored by from_json_compatible. A str
+    # keyed dict that uses a tag as a key is written as __items__ too, so it can't be mistaken for a tagged value.
+    if isinstance(v, dict):
+        key_types = {type(k) for k in v}
+        if key_types <= {str} and not any(tag in v for tag in json_tags):
+            return {k: to_json_compatible(x) for k, x in v.items()}
+        if key_types == {int}:
+            return {"__int_keys__": {str(k): to_json_compatible(x) for k, x in v.items()}}
+        return {"__items__": [[to_json_compatible(k), to_json_compatible(x)] for k, x in v.items()]}
+    if isinstance(v, list):
+        return [to_json_compatible(x) for x in v]
+    if isinstance(v, tuple):
+        return {"__tuple__": [to_json_compatible(x) for x in v]}
+    if isinstance(v, (set, frozenset)):
+        return {"__set__": [to_json_compatible(x) for x in v]}
+    return v
+
+
+def from_json_compatible(d):
+    if len(d) == 1:
+        if "__int_keys__" in d:
+            return {int(k): x for k, x in d["__int_keys__"].items()}
+        if "__items__" in d:
+            return {k: x for k, x in d["__items__"]}
+        if "__tuple__" in d:
+            return tuple(d["__tuple__"])
+        if "__set__" in d:
+            return set(d["__set__"])
+    return d
+
+
+@Format("json")
+class JsonFormat:
+    @staticmethod
+    def encode(v, line_width):
+        return json.dumps(to_json_compatible(v), separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    @staticmethod
+    def decode(body):
+        return json.loads(body.decode("utf-8"), object_hook=from_json_compatible)
+
+
+@Format("pickle")
+class PickleFormat:
+    # Only ever used on the bot's own database, which is as trusted as the bot's code.
+    @staticmethod
+    def encode(v, line_width):
+        return pickle.dumps(v, protocol=pickle_protocol)
+
+    @staticmethod
+    def decode(body):
+        return pickle.loads(body)
+
+
+def get_format(name):
+    if name not in formats:
+        raise EncodingError(f"I don't recognise the database format {name}.")
+    return formats[name]
+
+
+def encode(v, format_name, line_width=80):
+    body = get_format(format_name).encode(v, line_width)
+    if format_name == "pprint":
+        return body
+    return header_prefix + f"{format_name} {format_version}\n".encode("ascii") + body
+
+
+def decode(blob):
+    if not blob.startswith(header_prefix):
+        return formats["pprint"].decode(blob)
+
+    header_end = blob.index(b"\n")
+    format_name, version = blob[len(header_prefix):header_end].decode("ascii").split()
+    if int(version) > format_version:
+        raise EncodingError(f"Data was saved in version {version} of the {format_name} format, "
+                            f"but I only understand up to version {format_version}.")
+    return get_format(format_name).decode(blob[header_end + 1:])
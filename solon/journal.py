@@ -0,0 +1,68 @@
+import ast
+import glob
+import logging
+import os
+
+__all__ = []
+
+log = logging.getLogger(__name__)
+
+
+class Journal:
+    # An append-only log of mutations, one repr'd tuple per line, split into numbered segment files. The database
+    # rotates to a new segment whenever it takes a snapshot, and deletes older segments once that snapshot is written.
+
+    def __init__(self, path, fsync):
+        self.path = path
+        self.fsync = fsync
+        self.file = None
+        self.bytes_written = 0
+
+        existing = self.segments()
+        self.segment = existing[-1] + 1 if existing else 1
+
+    def segment_path(self, segment):
+        return f"{self.path}.{segment}"
+
+    def segments(self):
+        segments = []
+        for path in glob.glob(glob.escape(self.path) + ".*"):
+            suffix = path[len(self.path) + 1:]
+            if suffix.isdigit():
+                segments.append(int(suffix))
+        return sorted(segments)
+
+    def read_records(self):
+        for segment in self.segments():
+            with open(self.segment_path(segment)) as f:
+                for line_number, line in enumerate(f, 1):
+                    try:
+                        yield ast.literal_eval(line)
+                    except (ValueError, SyntaxError):
+                        # Most likely the bot died halfway through writing this line
+                        log.error(f"Skipping unreadable journal record on line {line_number} of segment {segment}.")
+
+    def append(self, record):
+        if self.file is None:
+            self.file = open(self.segment_path(self.segment), "a")
+
+        line = repr(record) + "\n"
+        self.file.write(line)
+        self.file.flush()
+        if self.fsync:
+            os.fsync(self.file.fileno())
+        self.bytes_written += len(line)
+
+    def rotate(self):
+        # Returns the last segment that a snapshot taken now will cover
+        if self.file is not None:
+            self.file.close()
+            self.file = None
+        self.bytes_written = 0
+        self.segment += 1
+        return self.segment - 1
+
+    def delete_through(self, segment):
+        for s in self.segments():
+            if s <= segment:
+                os.remove(self.segment_path(s))
@@ -0,0 +1,227 @@
+import discord
+import discord.ext.commands
+import logging
+
+from .core import ForwardDiscordPyCog
+
+__all__ = []
+
+log = logging.getLogger(__name__)
+
+
+# Per guild indexes from lower-cased names to ids, so codices can resolve a name without scanning every member, role or
+# channel of the guild. Each index is built from the guild the first time it's needed and kept up to date from
+# gateway events after that. Hits are always checked against the object discord.py has, so an index that missed an
+# event never returns the wrong object. Misses are trusted, unless the guild's count of members, roles or channels has
+# drifted from what the index has seen, in which case it missed an event and is rebuilt.
+
+def member_name_keys(member):
+    keys = [member.name.lower()]
+    if member.nick:
+        keys.append(member.nick.lower())
+    return keys
+
+
+def member_tag_keys(member):
+    return [f"{member.name.lower()}#{member.discriminator}"]
+
+
+def name_keys(x):
+    return [x.name.lower()]
+
+
+class NameIndex:
+    def __init__(self, keys_of, get_object, get_all, count_of):
+        self.keys_of = keys_of
+        self.get_object = get_object
+        self.get_all = get_all
+        self.count_of = count_of
+        self.ids_by_key = {}  # key -> {id: None}, as an insertion ordered set
+        self.keys_by_id = {}
+        self.drift = 0  # count_of the guild minus the number of indexed objects, as of the last build
+
+    def build(self, guild):
+        self.ids_by_key.clear()
+        self.keys_by_id.clear()
+        for x in self.get_all(guild):
+            self.add(x)
+        # Not always 0: member_count includes members that aren't cached without the members intent
+        self.drift = self.count_of(guild) - len(self.keys_by_id)
+
+    def is_stale(self, guild):
+        return self.count_of(guild) - len(self.keys_by_id) != self.drift
+
+    def add(self, x):
+        keys = self.keys_of(x)
+        self.keys_by_id[x.id] = keys
+        for key in keys:
+            self.ids_by_key.setdefault(key, {})[x.id] = None
+
+    def remove(self, x_id):
+        for key in self.keys_by_id.pop(x_id, ()):
+            ids = self.ids_by_key[key]
+            del ids[x_id]
+            if not ids:
+                del self.ids_by_key[key]
+
+    def update(self, x):
+        self.remove(x.id)
+        self.add(x)
+
+    def find(self, guild, key, *, rebuild_if_stale=True):
+        for x_id in list(self.ids_by_key.get(key, ())):
+            x = self.get_object(guild, x_id)
+            if x is None:
+                self.remove(x_id)
+            elif key in self.keys_of(x):
+                return x
+            else:
+                self.update(x)
+
+        if rebuild_if_stale and self.is_stale(guild):
+            log.debug(f"Index for guild {guild.id} missed an event, rebuilding it.")
+            self.build(guild)
+            return self.find(guild, key, rebuild_if_stale=False)
+        return None
+
+
+index_kinds = {
+    "member_names": (member_name_keys, lambda guild, x_id: guild.get_member(x_id), lambda guild: guild.members,
+                     lambda guild: guild.member_count),
+    "member_tags": (member_tag_keys, lambda guild, x_id: guild.get_member(x_id), lambda guild: guild.members,
+                    lambda guild: guild.member_count),
+    "roles": (name_keys, lambda guild, x_id: guild.get_role(x_id), lambda guild: guild.roles,
+              lambda guild: len(guild.roles)),
+    "channels": (name_keys, lambda guild, x_id: guild.get_channel(x_id), lambda guild: guild.channels,
+                 lambda guild: len(guild.channels)),
+}
+member_index_kinds = ["member_names", "member_tags"]
+
+guild_indexes = {}  # guild id -> kind -> NameIndex, only for the kinds that have been built
+
+
+def get_index(guild, kind):
+    indexes = guild_indexes.setdefault(guild.id, {})
+    if kind not in indexes:
+        index = NameIndex(*index_kinds[kind])
+        index.build(guild)
+        indexes[kind] = index
+        log.debug(f"Built {kind} index for guild {guild.id} with {len(index.keys_by_id)} entries.")
+    return indexes[kind]
+
+
+def built_indexes(guild, kinds):
+    indexes = guild_indexes.get(guild.id, {})
+    return [indexes[kind] for kind in kinds if kind in indexes]
+
+
+def find_member_by_tag(guild, name, discriminator):
+    return get_index(guild, "member_tags").find(guild, f"{name.lower()}#{discriminator}")
+
+
+def find_member_by_name(guild, name):
+    # Matches either the nick or the name of the member
+    return get_index(guild, "member_names").find(guild, name.lower())
+
+
+def find_role_by_name(guild, name):
+    return get_index(guild, "roles").find(guild, name.lower())
+
+
+def find_channel_by_name(guild, name):
+    return get_index(guild, "channels").find(guild, name.lower())
+
+
+guild_emojis = {}  # guild id -> emoji id -> discord.Emoji, dropped whenever the guild's emojis change
+
+
+def get_guild_emoji(guild, emoji_id):
+    if guild.id not in guild_emojis:
+        guild_emojis[guild.id] = {emoji.id: emoji for emoji in guild.emojis}
+    return guild_emojis[guild.id].get(emoji_id)
+
+
+@ForwardDiscordPyCog
+class LookupCog(discord.ext.commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_member_join(member):
+        for index in built_indexes(member.guild, member_index_kinds):
+            index.add(member)
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_member_remove(member):
+        for index in built_indexes(member.guild, member_index_kinds):
+            index.remove(member.id)
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_member_update(before, after):
+        if before.nick != after.nick or before.name != after.name or before.discriminator != after.discriminator:
+            for index in built_indexes(after.guild, member_index_kinds):
+                index.update(after)
+
+    @discord.ext.commands.Cog.listener()
+    async def on_user_update(self, before, after):
+        # Name and discriminator changes arrive here rather than per member
+        if before.name == after.name and before.discriminator == after.discriminator:
+            return
+        for guild_id in list(guild_indexes):
+            guild = self.bot.get_guild(guild_id)
+            member = guild and guild.get_member(after.id)
+            if member is not None:
+                for index in built_indexes(guild, member_index_kinds):
+                    index.update(member)
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_guild_role_create(role):
+        for index in built_indexes(role.guild, ["roles"]):
+            index.add(role)
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_guild_role_delete(role):
+        for index in built_indexes(role.guild, ["roles"]):
+            index.remove(role.id)
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_guild_role_update(before, after):
+        if before.name != after.name:
+            for index in built_indexes(after.guild, ["roles"]):
+                index.update(after)
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_guild_channel_create(channel):
+        for index in built_indexes(channel.guild, ["channels"]):
+            index.add(channel)
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_guild_channel_delete(channel):
+        for index in built_indexes(channel.guild, ["channels"]):
+            index.remove(channel.id)
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_guild_channel_update(before, after):
+        if before.name != after.name:
+            for index in built_indexes(after.guild, ["channels"]):
+                index.update(after)
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_guild_emojis_update(guild, before, after):
+        guild_emojis.pop(guild.id, None)
+
+    @staticmethod
+    @discord.ext.commands.Cog.listener()
+    async def on_guild_remove(guild):
+        guild_indexes.pop(guild.id, None)
+        guild_emojis.pop(guild.id, None)
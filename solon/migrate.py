@@ -0,0 +1,23 @@
+"""
+Imports a flat file database folder into an SQLite database:
+
+    python -m solon.migrate db_folder db_folder.sqlite3
+"""
+
+import argparse
+
+from .storage import FlatFileBackend
+from .storage import SqliteBackend
+from .storage import migrate
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import a flat file database folder into an SQLite database.")
+    parser.add_argument("folder", help="the database folder to import")
+    parser.add_argument("destination", help="the SQLite file to import into")
+    args = parser.parse_args()
+
+    source_backend = FlatFileBackend(args.folder)
+    destination_backend = SqliteBackend(args.destination)
+    count = migrate(source_backend, destination_backend)
+    destination_backend.close()
+    print(f"Imported {count} objects from {args.folder} into {args.destination}.")
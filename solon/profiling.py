@@ -0,0 +1,161 @@
+"""
+Startup tracing. Loaded before everything else in the package, so it can't rely on config or logging being set up.
+
+Set SOLON_STARTUP_TRACE to a file name to have a Chrome trace (chrome://tracing, Perfetto) of startup written there
+once on_ready has finished. Set SOLON_TRACE_ALLOCATIONS=1 to also measure allocated bytes with tracemalloc, which
+slows startup down noticeably. Net allocated blocks are always measured.
+"""
+
+import importlib.abc
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import tracemalloc
+
+__all__ = ["get_startup_report"]
+
+log = logging.getLogger(__name__)
+
+
+class PhaseRecord:
+    def __init__(self, name, category, start):
+        self.name = name
+        self.category = category
+        self.start = start
+        self.duration = 0.0
+        self.allocated_blocks = 0
+        self.allocated_bytes = None
+        self.thread_id = threading.get_ident()
+
+    def as_dict(self):
+        return {"name": self.name, "category": self.category, "start": self.start, "duration": self.duration,
+                "allocated_blocks": self.allocated_blocks, "allocated_bytes": self.allocated_bytes}
+
+
+class Phase:
+    def __init__(self, tracer, name, category):
+        self.tracer = tracer
+        self.name = name
+        self.category = category
+
+    def __enter__(self):
+        self.blocks = sys.getallocatedblocks()
+        self.traced = tracemalloc.get_traced_memory()[0] if tracemalloc.is_tracing() else None
+        self.record = PhaseRecord(self.name, self.category, time.perf_counter() - self.tracer.origin)
+        return self.record
+
+    def __exit__(self, exc_type, exc_value, tb):
+        self.record.duration = time.perf_counter() - self.tracer.origin - self.record.start
+        self.record.allocated_blocks = sys.getallocatedblocks() - self.blocks
+        if self.traced is not None and tracemalloc.is_tracing():
+            self.record.allocated_bytes = tracemalloc.get_traced_memory()[0] - self.traced
+        if not self.tracer.finished:
+            self.tracer.records.append(self.record)
+        return False
+
+
+class TracingLoader(importlib.abc.Loader):
+    def __init__(self, loader, tracer, name):
+        self.loader = loader
+        self.tracer = tracer
+        self.name = name
+
+    def create_module(self, spec):
+        return self.loader.create_module(spec)
+
+    def exec_module(self, module):
+        with self.tracer.phase(f"import {self.name}", "import"):
+            self.loader.exec_module(module)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+class ImportTracer(importlib.abc.MetaPathFinder):
+    # Times the import of every module in this package, nested imports included
+    def __init__(self, tracer, package):
+        self.tracer = tracer
+        self.prefix = f"{package}."
+
+    def find_spec(self, fullname, path, target=None):
+        if not fullname.startswith(self.prefix):
+            return None
+        for finder in sys.meta_path:
+            # Other tracers would call back into this one, e.g. if solon/__init__ ran again after a failed import
+            if isinstance(finder, ImportTracer) or not hasattr(finder, "find_spec"):
+                continue
+            spec = finder.find_spec(fullname, path, target)
+            if spec is not None:
+                if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                    spec.loader = TracingLoader(spec.loader, self.tracer, fullname)
+                return spec
+        return None
+
+
+class StartupTracer:
+    def __init__(self):
+        self.origin = time.perf_counter()
+        self.records = []
+        self.finished = False
+        self.total = None
+        self.import_tracer = None
+
+    def phase(self, name, category="init"):
+        return Phase(self, name, category)
+
+    def install_import_hook(self, package):
+        # solon/__init__ runs again on importlib.reload(solon), or when importing it is retried after a failure
+        if self.import_tracer is not None and self.import_tracer in sys.meta_path:
+            return
+        self.import_tracer = ImportTracer(self, package)
+        sys.meta_path.insert(0, self.import_tracer)
+
+    def report(self):
+        total = self.total if self.total is not None else time.perf_counter() - self.origin
+        return {"finished": self.finished, "total_seconds": total,
+                "phases": [record.as_dict() for record in self.records]}
+
+    def chrome_trace(self):
+        pid = os.getpid()
+        events = []
+        for record in self.records:
+            events.append({"name": record.name, "cat": record.category, "ph": "X", "pid": pid,
+                           "tid": record.thread_id, "ts": record.start * 1e6, "dur": record.duration * 1e6,
+                           "args": {"allocated_blocks": record.allocated_blocks,
+                                    "allocated_bytes": record.allocated_bytes}})
+        return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+    def finish(self):
+        if self.finished:
+            return
+        self.total = time.perf_counter() - self.origin
+        self.finished = True
+
+        if self.import_tracer is not None:
+            sys.meta_path.remove(self.import_tracer)
+            self.import_tracer = None
+        if tracemalloc.is_tracing() and os.environ.get("SOLON_TRACE_ALLOCATIONS"):
+            tracemalloc.stop()
+
+        slowest = sorted(self.records, key=lambda r: -r.duration)[:10]
+        log.info(f"Startup took {self.total:.3f}s. Slowest phases: "
+                 + ", ".join(f"{record.name} {record.duration:.3f}s" for record in slowest))
+
+        trace_path = os.environ.get("SOLON_STARTUP_TRACE")
+        if trace_path:
+            with open(trace_path, "w") as f:
+                json.dump(self.chrome_trace(), f)
+            log.info(f"Wrote startup trace to {trace_path}.")
+
+
+startup_tracer = StartupTracer()
+
+if os.environ.get("SOLON_TRACE_ALLOCATIONS") and not tracemalloc.is_tracing():
+    tracemalloc.start()
+
+
+def get_startup_report():
+    return startup_tracer.report()
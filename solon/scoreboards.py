@@ -1,4 +1,9 @@
+import asyncio
+import bisect
+import discord
+import itertools
 import logging
+import time
 import weakref
 
 from .bot import Bot
@@ -6,9 +11,10 @@ from .bot import get_identifier
 from .config import get_config
 from .core import SocratesRuntimeError
 from .core import timedelta_from_string
+from .timing import DispatchRateLimiter
 from .timing import TimedEvent
 
-__all__ = ["register_scoreboard", "get_scoreboard_by_identifier"]
+__all__ = ["register_scoreboard", "get_scoreboard_by_identifier", "RankedScoreboard"]
 
 log = logging.getLogger(__name__)
 config = get_config(__name__)
@@ -23,6 +29,15 @@ class ScoreboardError(SocratesRuntimeError):
 award_rankings_callbacks = {}
 award_methods = {}
 scoreboards_by_identifier = {}
+award_stats = {}  # identifier -> AwardStats of the last award_rankings run
+
+# Role updates from every guild share these limits. discord.py still handles the actual rate limits of each route,
+# this just keeps a big award run from queueing thousands of requests at once.
+max_concurrent_role_updates = config.get("max_concurrent_role_updates", 4)
+max_role_updates_per_second = config.get("max_role_updates_per_second", None)  # None for no limit
+role_update_semaphore = None  # created on first use, inside the event loop
+role_update_rate_limiter = None if max_role_updates_per_second is None else DispatchRateLimiter(
+    max_role_updates_per_second)
 
 
 def get_scoreboard_by_identifier(identifier):
@@ -32,6 +47,147 @@ def get_scoreboard_by_identifier(identifier):
     return sb.scoreboard
 
 
+class RankedScoreboard(dict):
+    # A dict of user id -> score that keeps its entries ranked, highest score first, as they're changed. Use it as a
+    # cog's scoreboard and award_by_rank won't need to sort it. The ranking is a list of sorted buckets of
+    # (-score, user id) entries, with the bucket sizes in a Fenwick tree, so updates and rank queries take
+    # logarithmic time. Ties are ranked by user id.
+    bucket_size = 512
+
+    def __init__(self, *args, **kwargs):
+        super(RankedScoreboard, self).__init__()
+        self.buckets = []
+        self.maxes = []  # the last entry of each bucket
+        self.tree = [0]
+        self.update(*args, **kwargs)
+
+    def __reduce__(self):
+        # The default for dict subclasses sets items before the ranking exists
+        return RankedScoreboard, (dict(self),)
+
+    def rebuild(self):
+        entries = sorted((-score, user_id) for user_id, score in super(RankedScoreboard, self).items())
+        self.buckets = [entries[i:i + self.bucket_size] for i in range(0, len(entries), self.bucket_size)]
+        self.maxes = [bucket[-1] for bucket in self.buckets]
+        self.rebuild_tree()
+
+    def rebuild_tree(self):
+        self.tree = [0] * (len(self.buckets) + 1)
+        for i, bucket in enumerate(self.buckets):
+            self.tree_add(i, len(bucket))
+
+    def tree_add(self, i, delta):
+        i += 1
+        while i < len(self.tree):
+            self.tree[i] += delta
+            i += i & -i
+
+    def entries_before_bucket(self, i):
+        total = 0
+        while i > 0:
+            total += self.tree[i]
+            i -= i & -i
+        return total
+
+    def insert(self, entry):
+        if not self.buckets:
+            self.buckets = [[entry]]
+            self.maxes = [entry]
+            self.rebuild_tree()
+            return
+
+        i = min(bisect.bisect_left(self.maxes, entry), len(self.buckets) - 1)
+        bucket = self.buckets[i]
+        bisect.insort(bucket, entry)
+        self.maxes[i] = bucket[-1]
+        if len(bucket) > 2 * self.bucket_size:
+            self.buckets[i:i + 1] = [bucket[:self.bucket_size], bucket[self.bucket_size:]]
+            self.maxes[i:i + 1] = [bucket[self.bucket_size - 1], bucket[-1]]
+            self.rebuild_tree()
+        else:
+            self.tree_add(i, 1)
+
+    def discard(self, entry):
+        i = bisect.bisect_left(self.maxes, entry)
+        bucket = self.buckets[i]
+        del bucket[bisect.bisect_left(bucket, entry)]
+        if bucket:
+            self.maxes[i] = bucket[-1]
+            self.tree_add(i, -1)
+        else:
+            del self.buckets[i]
+            del self.maxes[i]
+            self.rebuild_tree()
+
+    def __setitem__(self, user_id, score):
+        if user_id in self:
+            old_score = super(RankedScoreboard, self).__getitem__(user_id)
+            if old_score == score:
+                return
+            self.discard((-old_score, user_id))
+        super(RankedScoreboard, self).__setitem__(user_id, score)
+        self.insert((-score, user_id))
+
+    def __delitem__(self, user_id):
+        self.discard((-self[user_id], user_id))
+        super(RankedScoreboard, self).__delitem__(user_id)
+
+    def pop(self, user_id, *default):
+        if user_id in self:
+            score = self[user_id]
+            del self[user_id]
+            return score
+        if default:
+            return default[0]
+        raise KeyError(user_id)
+
+    def popitem(self):
+        user_id, score = super(RankedScoreboard, self).popitem()
+        self.discard((-score, user_id))
+        return user_id, score
+
+    def setdefault(self, user_id, default=None):
+        if user_id not in self:
+            self[user_id] = default
+        return self[user_id]
+
+    def clear(self):
+        super(RankedScoreboard, self).clear()
+        self.buckets = []
+        self.maxes = []
+        self.tree = [0]
+
+    def update(self, *args, **kwargs):
+        items = dict(*args, **kwargs)
+        if not self:
+            # Much faster than inserting one by one, e.g. when loading a saved scoreboard
+            super(RankedScoreboard, self).update(items)
+            self.rebuild()
+        else:
+            for user_id, score in items.items():
+                self[user_id] = score
+
+    def __ior__(self, other):
+        self.update(other)
+        return self
+
+    def copy(self):
+        return RankedScoreboard(self)
+
+    def rank(self, user_id):
+        # 0 for the highest score
+        entry = (-self[user_id], user_id)
+        i = bisect.bisect_left(self.maxes, entry)
+        return self.entries_before_bucket(i) + bisect.bisect_left(self.buckets[i], entry)
+
+    def ranked_items(self):
+        # Highest score first. Don't change the scoreboard while iterating over this.
+        return ((user_id, -score) for score, user_id in itertools.chain.from_iterable(self.buckets))
+
+    def top(self, count):
+        return list(itertools.islice(self.ranked_items(), count))
+
+
 def AwardMethod(key):
     def wrapper(cls):
         award_methods[key.lower()] = cls
@@ -40,38 +196,61 @@ def AwardMethod(key):
     return wrapper
 
 
+class ScoreThresholds:
+    # award_ranks split into sorted arrays of thresholds, so the roles reached by a score are found by bisection.
+    # Positive thresholds are reached by scores at or above them, negative ones by scores at or below them.
+    def __init__(self, award_ranks):
+        positive = sorted(((t, role) for t, role in award_ranks.items() if t >= 0), key=lambda kv: kv[0])
+        negative = sorted(((t, role) for t, role in award_ranks.items() if t < 0), key=lambda kv: kv[0])
+        self.positive_thresholds = [t for t, _ in positive]
+        self.positive_roles = [role for _, role in positive]
+        self.negative_thresholds = [t for t, _ in negative]
+        self.negative_roles = [role for _, role in negative]
+
+    def resolve(self, score):
+        i = bisect.bisect_right(self.positive_thresholds, score)
+        j = bisect.bisect_left(self.negative_thresholds, score)
+        roles_to_add = self.positive_roles[:i] + self.negative_roles[j:]
+        roles_to_remove = self.positive_roles[i:] + self.negative_roles[:j]
+        return roles_to_add, roles_to_remove
+
+
+def get_score_thresholds(settings):
+    # Kept in the settings structure's cache for award_ranks, which is dropped whenever award_ranks changes
+    if not hasattr(settings, "field_cache"):
+        return ScoreThresholds(settings["award_ranks"])
+    cache = settings.field_cache("award_ranks")
+    if "score_thresholds" not in cache:
+        cache["score_thresholds"] = ScoreThresholds(settings["award_ranks"])
+    return cache["score_thresholds"]
+
+
 @AwardMethod("score")
 class award_by_score:
     def __init__(self, scoreboard):
         self.scoreboard = scoreboard
+        self.thresholds = None
 
     @property
     def modified_scoreboard(self):
         return self.scoreboard.items()
 
-    def resolve_awards(self, member, score, award_ranks):
-        roles_to_add = []
-        roles_to_remove = []
+    def load_settings(self, settings):
+        self.thresholds = get_score_thresholds(settings)
 
-        for threshold, role in award_ranks.items():
-            if threshold >= 0:
-                if score >= threshold:
-                    roles_to_add.append(role)
-                else:
-                    roles_to_remove.append(role)
-
-            elif threshold < 0:
-                if score <= threshold:
-                    roles_to_add.append(role)
-                else:
-                    roles_to_remove.append(role)
-        return roles_to_add, roles_to_remove
+    def resolve_awards(self, member, score, award_ranks):
+        if self.thresholds is None:
+            self.thresholds = ScoreThresholds(award_ranks)
+        return self.thresholds.resolve(score)
 
 
 @AwardMethod("rank")
 class award_by_rank:
     def __init__(self, scoreboard):
-        self.scoreboard = sorted(scoreboard.items(), key=lambda kv: -kv[1])
+        if isinstance(scoreboard, RankedScoreboard):
+            self.scoreboard = scoreboard.ranked_items()
+        else:
+            self.scoreboard = sorted(scoreboard.items(), key=lambda kv: -kv[1])
         self.member_count = 0
 
     @property
@@ -93,57 +272,118 @@ class award_by_rank:
         return roles_to_add, roles_to_remove
 
 
+class AwardStats:
+    def __init__(self):
+        self.members_changed = 0
+        self.calls_issued = 0
+        self.calls_skipped = 0  # add or remove calls that weren't needed as the member already had the right roles
+        self.calls_failed = 0
+
+    def __str__(self):
+        return (f"{self.calls_issued} API calls issued ({self.calls_failed} failed) and {self.calls_skipped} skipped "
+                f"for {self.members_changed} members changed")
+
+
+def compute_role_diffs(guild, award_method, settings, stats):
+    # One pass over the scoreboard, working on sets of role ids. Returns [(member, roles to add, roles to remove)] for
+    # the members whose roles actually need to change.
+    award_ranks = settings["award_ranks"]
+    award_eligible = settings["award_eligible"]
+    award_ranks_exclude = settings.get("award_ranks_exclude", None)
+
+    if award_eligible is None:
+        return []
+
+    if hasattr(award_method, "load_settings"):
+        award_method.load_settings(settings)
+
+    award_roles = {role.id: role for role in award_ranks.values() if role is not None}
+    excluded_role_ids = {role.id for role in award_ranks_exclude or () if role is not None}
+
+    role_diffs = []
+    for user_id, score in award_method.modified_scoreboard:
+        member = guild.get_member(user_id)
+        if member is None:
+            continue
+
+        member_role_ids = {role.id for role in member.roles}
+        if award_eligible.id not in member_role_ids:
+            continue
+
+        if member_role_ids.isdisjoint(excluded_role_ids):
+            roles_to_add, _ = award_method.resolve_awards(member, score, award_ranks)
+            target_role_ids = {role.id for role in roles_to_add if role is not None}
+        else:
+            target_role_ids = set()
+
+        current_role_ids = member_role_ids.intersection(award_roles)
+        add_ids = target_role_ids - current_role_ids
+        remove_ids = current_role_ids - target_role_ids
+
+        stats.calls_skipped += (not add_ids) + (not remove_ids)
+        if add_ids or remove_ids:
+            role_diffs.append((member, [award_roles[i] for i in add_ids], [award_roles[i] for i in remove_ids]))
+
+    return role_diffs
+
+
+def get_role_update_semaphore():
+    global role_update_semaphore
+    if role_update_semaphore is None:
+        role_update_semaphore = asyncio.Semaphore(max_concurrent_role_updates)
+    return role_update_semaphore
+
+
+async def wait_for_role_update_rate_limit():
+    if role_update_rate_limiter is not None:
+        while role_update_rate_limiter.available(time.time()) < 1:
+            await asyncio.sleep(role_update_rate_limiter.time_until_available())
+        role_update_rate_limiter.take(1)
+
+
+async def apply_role_diff(member, roles_to_add, roles_to_remove, stats, identifier):
+    reason = f"Awards redistribution"
+    async with get_role_update_semaphore():
+        for update, roles in ((member.add_roles, roles_to_add), (member.remove_roles, roles_to_remove)):
+            if not roles:
+                continue
+
+            await wait_for_role_update_rate_limit()
+            stats.calls_issued += 1
+            try:
+                await update(*roles, reason=reason)
+            except discord.HTTPException as e:
+                stats.calls_failed += 1
+                log.warning(f"Couldn't update roles {roles} for {member} in {identifier}: {e}")
+
+    log.info(f"Adding roles {roles_to_add} and removing roles {roles_to_remove} for {member} in {identifier}")
+
+
+async def apply_role_diffs(role_diffs, stats, identifier):
+    stats.members_changed = len(role_diffs)
+    await asyncio.gather(*(apply_role_diff(member, roles_to_add, roles_to_remove, stats, identifier)
+                           for member, roles_to_add, roles_to_remove in role_diffs))
+
+
 def register_scoreboard(scoreboard_cog, guild_id, settings):
     if not hasattr(scoreboard_cog, "scoreboard"):
         raise ScoreboardError("No 'scoreboard' attribute found.")
 
     @TimedEvent()
     async def award_rankings(_):
-        award_ranks = settings["award_ranks"]
-        award_eligible = settings["award_eligible"]
-        award_ranks_exclude = settings.get("award_ranks_exclude", None)
-
         guild = Bot.get_guild(guild_id)
 
-        sb = scoreboard_cog.scoreboard
-
         award_method_key = settings["award_method"].lower()
         if award_method_key not in award_methods:
             raise ScoreboardError(f"I don't recognise the award method {award_method_key} in {guild}.")
 
-        award_method = award_methods[award_method_key](sb)
-        for user_id, score in award_method.modified_scoreboard:
-            member = guild.get_member(user_id)
-            if member:
-                excluded = False
-                if award_ranks_exclude:
-                    for role in member.roles:
-                        if role in award_ranks_exclude:
-                            excluded = True
-                            break
-
-                if award_eligible in member.roles:
-                    if not excluded:
-                        roles_to_add, roles_to_remove = award_method.resolve_awards(member, score, award_ranks)
-
-                        # Filter roles so we're not sending requests to add Rank X when the member already has Rank X
-                        roles_to_add = [role for role in roles_to_add if role not in member.roles]
-                        roles_to_remove = [role for role in roles_to_remove if role in member.roles]
-                    else:
-                        roles_to_add = []
-                        roles_to_remove = [role for role in award_ranks.values() if role in member.roles]
-
-                    reason = f"Awards redistribution"
-                    if roles_to_add:
-                        await member.add_roles(*roles_to_add, reason=reason)
-                        reason = None
-
-                    if roles_to_remove:
-                        await member.remove_roles(*roles_to_remove, reason=reason)
-
-                    if roles_to_add or roles_to_remove:
-                        log.info(f"Adding roles {roles_to_add} and removing "
-                                 f"roles {roles_to_remove} for {member} in {scoreboard_cog.identifier}")
-
-    scoreboards_by_identifier[scoreboard_cog.__class__.__name__] = weakref.ref(scoreboard_cog)
-    award_rankings.start(scoreboard_cog, timedelta_from_string(config["award_interval"]))
+        award_method = award_methods[award_method_key](scoreboard_cog.scoreboard)
+        stats = AwardStats()
+        role_diffs = compute_role_diffs(guild, award_method, settings, stats)
+        await apply_role_diffs(role_diffs, stats, scoreboard_cog.identifier)
+
+        award_stats[scoreboard_cog.identifier] = stats
+        log.info(f"Awarded roles in {scoreboard_cog.identifier}: {stats}")
+
+    scoreboards_by_identifier[scoreboard_cog.identifier] = weakref.ref(scoreboard_cog)
+    award_rankings.start(scoreboard_cog, timedelta_from_string(config["award_interval"]), spread=True)
@@ -1,5 +1,6 @@
 import datetime
 import discord
+import logging
 import re
 import ast
 
@@ -8,11 +9,19 @@ from .core import SocratesRuntimeError
 from .core import is_emoji
 from .core import timedelta_from_string
 from .emoji import Emoji
+from .lookup import find_channel_by_name
+from .lookup import find_member_by_name
+from .lookup import find_member_by_tag
+from .lookup import find_role_by_name
+from .lookup import get_guild_emoji
 
 __all__ = ["serialize", "deserialize", "Codex", "SerializedData", "converter", "SerializedList", "SerializedStructure",
            "SerializedDictionary"]
 
 
+log = logging.getLogger(__name__)
+
+
 class SerializationError(SocratesRuntimeError):
     pass
 
@@ -85,21 +94,53 @@ class SerializedData:
         return str(self.as_pair)
 
 
+compiled_codecs = {}
+
+
+def compile_codec(type_name):
+    # Resolves a codex once into a pair of plain functions, serialize_value(x_data) -> str and
+    # deserialize_value(value_serialized, guild), so composite types can bind their element codecs up front instead of
+    # looking the codex up and wrapping every element in SerializedData.
+    key = type_name_to_key(type_name)
+    if key in compiled_codecs:
+        return compiled_codecs[key]
+
+    codex = get_codex(type_name)
+    codex_serialize = codex.codex_serialize
+    null_value = getattr(codex, "null_value", lambda: None)
+
+    codex_deserialize_value = getattr(codex, "codex_deserialize_value", None)
+    if codex_deserialize_value is None:
+        # Codices from outside solon may still take SerializedData
+        codex_deserialize = codex.codex_deserialize
+        codex_type_name = codex.type_name
+
+        def codex_deserialize_value(value_serialized, guild):
+            serialized_data = SerializedData(value_serialized=value_serialized, type_name=codex_type_name)
+            return codex_deserialize(serialized_data, guild)
+
+    def serialize_value(x_data):
+        if x_data is None:
+            return ""
+        return codex_serialize(x_data)
+
+    def deserialize_value(value_serialized, guild):
+        if value_serialized == "":
+            return null_value()
+        return codex_deserialize_value(value_serialized, guild)
+
+    compiled_codecs[key] = (serialize_value, deserialize_value)
+    return compiled_codecs[key]
+
+
 def serialize(x_data, type_name) -> SerializedData:
-    if x_data is not None:
-        codex = get_codex(type_name)
-        value_serialized = codex.codex_serialize(x_data)
-    else:
-        value_serialized = ""
-    return SerializedData(value_serialized=value_serialized, type_name=type_name)
+    serialize_value, _ = compile_codec(type_name)
+    return SerializedData(value_serialized=serialize_value(x_data), type_name=type_name)
 
 
 def deserialize(serialized_data: SerializedData, guild: discord.Guild):
-    if serialized_data.value_serialized == "":
-        return type_name_to_null_value(serialized_data.type_name)
-
-    codex = get_codex(serialized_data.type_name)
-    return codex.codex_deserialize(serialized_data, guild)
+    _, deserialize_value = compile_codec(serialized_data.type_name)
+    return deserialize_value(serialized_data.value_serialized, guild)
 
 
 def converter(serializable_cls):
@@ -115,6 +156,85 @@ def converter(serializable_cls):
     return AsConverter
 
 
+def notifying(base, method_name, added_values):
+    # added_values(self, args, result) gives the values the call put into the container, or None if it could have put
+    # any of them there. Lists and dictionaries among them are watched too.
+    method = getattr(base, method_name)
+
+    def wrapper(self, *args, **kwargs):
+        result = method(self, *args, **kwargs)
+        values = added_values(self, args, result)
+        if values is None:
+            self.watch_children()
+        else:
+            for value in values:
+                self.watch(value)
+        if self.on_change is not None:
+            self.on_change()
+        return result
+
+    wrapper.__name__ = method_name
+    return wrapper
+
+
+class ChangeNotifying:
+    # on_change is set by whatever holds the container, and called after every mutation of it or of a list or
+    # dictionary inside it, however deeply nested
+    on_change = None
+
+    def child_changed(self):
+        if self.on_change is not None:
+            self.on_change()
+
+    def watch(self, value):
+        if isinstance(value, ChangeNotifying):
+            value.on_change = self.child_changed
+            value.watch_children()
+
+    def watch_children(self):
+        for value in self.child_values():
+            self.watch(value)
+
+
+class ChangeNotifyingList(ChangeNotifying, list):
+    def child_values(self):
+        return list.__iter__(self)
+
+
+class ChangeNotifyingDict(ChangeNotifying, dict):
+    def child_values(self):
+        return dict.values(self)
+
+
+def nothing_added(self, args, result):
+    return ()
+
+
+def anything_added(self, args, result):
+    return None
+
+
+def item_added(self, args, result):
+    return None if isinstance(args[0], slice) else [args[1]]
+
+
+list_methods = {"__setitem__": item_added, "__delitem__": nothing_added, "__iadd__": anything_added,
+                "__imul__": nothing_added, "append": lambda self, args, result: [args[0]], "extend": anything_added,
+                "insert": lambda self, args, result: [args[1]], "pop": nothing_added, "remove": nothing_added,
+                "clear": nothing_added, "sort": nothing_added, "reverse": nothing_added}
+
+dict_methods = {"__setitem__": item_added, "__delitem__": nothing_added, "__ior__": anything_added,
+                "pop": nothing_added, "popitem": nothing_added, "clear": nothing_added, "update": anything_added,
+                "setdefault": lambda self, args, result: [result]}
+
+for method_name, added_values in list_methods.items():
+    setattr(ChangeNotifyingList, method_name, notifying(list, method_name, added_values))
+
+for method_name, added_values in dict_methods.items():
+    if hasattr(dict, method_name):  # dict.__ior__ is new in Python 3.9
+        setattr(ChangeNotifyingDict, method_name, notifying(dict, method_name, added_values))
+
+
 serialized_list_types = {}
 
 
@@ -122,12 +242,73 @@ def is_serialized_list(v):
     return v in serialized_list_types.values()
 
 
+class ListSyntaxError(ValueError):
+    # Not a SocratesError, so it isn't logged - callers report it in errors of their own
+    pass
+
+
+word_regex = re.compile(r'\S+')
+whitespace_regex = re.compile(r'\s*')
+quoted_regex = re.compile(r"'((?:[^'\\\n]|\\.)*)'" r'|"((?:[^"\\\n]|\\.)*)"')
+quoted_list_regex = re.compile(r'\s*\[\s*(?:(?:' + quoted_regex.pattern + r')\s*,\s*)*(?:(?:' + quoted_regex.pattern
+                               + r')\s*,?\s*)?\]\s*')
+
+
+def parse_quoted_list(text):
+    # Parses the output of str() on a list of strings, e.g. ['a', "b's"]. A valid list is matched and split up by the
+    # regex engine, only an invalid one is walked through by hand to find where it goes wrong.
+    if quoted_list_regex.fullmatch(text) is None:
+        raise ListSyntaxError(find_list_syntax_error(text))
+
+    elements = []
+    for single_quoted, double_quoted in quoted_regex.findall(text):
+        element = single_quoted or double_quoted
+        if "\\" in element:
+            quote = "'" if single_quoted else '"'
+            element = ast.literal_eval(quote + element + quote)
+        elements.append(element)
+    return elements
+
+
+def find_list_syntax_error(text):
+    position = whitespace_regex.match(text).end()
+    if not text.startswith("[", position):
+        return f"expected [ at position {position}."
+    position = whitespace_regex.match(text, position + 1).end()
+
+    if not text.startswith("]", position):
+        while True:
+            match = quoted_regex.match(text, position)
+            if match is None:
+                return f"expected a quoted value at position {position}."
+
+            position = whitespace_regex.match(text, match.end()).end()
+            if text.startswith(",", position):
+                position = whitespace_regex.match(text, position + 1).end()
+                if text.startswith("]", position):
+                    break
+            elif text.startswith("]", position):
+                break
+            else:
+                return f"expected , or ] at position {position}."
+
+    position = whitespace_regex.match(text, position + 1).end()
+    return f"unexpected {text[position:position + 1]} at position {position}."
+
+
+def list_syntax_hint(text):
+    # For errors about values that look like they were meant to be a bracketed list
+    if not text.lstrip().startswith("["):
+        return ""
+    return f" If it's meant to be a bracketed list: {find_list_syntax_error(text)}"
+
+
 def SerializedList(element_cls):
     key = f"{element_cls.__name__}List"
     if key in serialized_list_types:
         return serialized_list_types[key]
 
-    class SerializedListType(list):
+    class SerializedListType(ChangeNotifyingList):
         element_class = element_cls
         element_type_name = type_to_type_name(element_cls)
 
@@ -142,6 +323,9 @@ def SerializedList(element_cls):
 
     SerializedListType.__name__ = key
 
+    serialize_element, deserialize_element = compile_codec(SerializedListType.element_type_name)
+    element_single_word = getattr(get_codex(SerializedListType.element_type_name), "single_word", False)
+
     class SerializedListCodex:
         type_name = key
 
@@ -151,47 +335,52 @@ def SerializedList(element_cls):
 
         @classmethod
         def codex_serialize(cls, x_data):
-            list_of_serialized = []
-            for element in x_data:
-                list_of_serialized.append(serialize(element, type_to_type_name(element_cls)).value_serialized)
-
-            return str(list_of_serialized)
+            return str([serialize_element(element) for element in x_data])
 
         @classmethod
         def codex_deserialize(cls, serialized_data, guild):
-            value_serialized = serialized_data.value_serialized
-
-            # First we try the type we serialize to - a list of serialized values
-            try:
-                return cls.deserialize_list_of_serialized(ast.literal_eval(value_serialized), guild)
-            except Exception:
-                pass
-
-            # If it's not that then we try it as a single element list holding the whole value
-            try:
-                return cls.deserialize_list_of_serialized([value_serialized], guild)
-            except Exception:
-                pass
-
-            # If it's not that then we split it by spaces and try that
-            try:
-                return cls.deserialize_list_of_serialized(value_serialized.split(), guild)
-            except Exception:
-                pass
-
-            # If it's not that then we're out of luck and the serialized data is malformed
-            raise SerializationError("I don't recognise the format of this list.")
+            return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
 
         @classmethod
-        def deserialize_list_of_serialized(cls, list_of_serialized, guild):
-            deserialized_list = SerializedListType()
-            for element_serialized in list_of_serialized:
-                element_sd = SerializedData(value_serialized=element_serialized,
-                                            type_name=type_to_type_name(element_cls))
-                deserialized_list.append(deserialize(element_sd, guild))
+        def codex_deserialize_value(cls, value_serialized, guild):
+            # Accepts, in this order:
+            #   ['a', 'b c']  the bracketed list of quoted serialized values we serialize to
+            #   a b c         the whole value as a single element, e.g. a role with a space in its name
+            #   a b c         the value split by whitespace
+            # The syntax is worked out from the value, so each element is deserialized at most twice: once as part of
+            # the whole value, and once on its own if that fails. The whole value isn't tried at all when it's several
+            # words and the element's codex sets single_word, as its values never hold whitespace (e.g. ints).
+            if quoted_list_regex.fullmatch(value_serialized) is not None:
+                deserialized_list = SerializedListType()
+                for index, element in enumerate(parse_quoted_list(value_serialized)):
+                    try:
+                        deserialized_list.append(deserialize_element(element, guild))
+                    except Exception as e:
+                        raise SerializationError(f"I can't read {element} (item {index + 1} of the list). {e}")
+                return deserialized_list
+
+            words = list(word_regex.finditer(value_serialized))
+            if len(words) <= 1 or not element_single_word:
+                try:
+                    return SerializedListType([deserialize_element(value_serialized, guild)])
+                except Exception as e:
+                    if len(words) == 1:
+                        raise SerializationError(f"I don't recognise the format of this list: {e}"
+                                                 + list_syntax_hint(value_serialized))
 
+            deserialized_list = SerializedListType()
+            for word in words:
+                try:
+                    deserialized_list.append(deserialize_element(word.group(), guild))
+                except Exception as e:
+                    raise SerializationError(f"I can't read {word.group()} at position {word.start()} of the list. {e}"
+                                             + list_syntax_hint(value_serialized))
             return deserialized_list
 
+        @staticmethod
+        def deserialize_list_of_serialized(list_of_serialized, guild):
+            return SerializedListType([deserialize_element(element, guild) for element in list_of_serialized])
+
     Codex(SerializedListType)(SerializedListCodex)
 
     serialized_list_types[key] = SerializedListType
@@ -210,7 +399,7 @@ def SerializedDictionary(key_element_cls, value_element_cls):
     if key in serialized_dictionary_types:
         return serialized_dictionary_types[key]
 
-    class SerializedDictionaryType(dict):
+    class SerializedDictionaryType(ChangeNotifyingDict):
         key_element_class = key_element_cls
         value_element_class = value_element_cls
 
@@ -226,6 +415,9 @@ def SerializedDictionary(key_element_cls, value_element_cls):
 
     SerializedDictionaryType.__name__ = key
 
+    serialize_key, deserialize_key = compile_codec(type_to_type_name(key_element_cls))
+    serialize_value, deserialize_value = compile_codec(type_to_type_name(value_element_cls))
+
     class SerializedDictionaryCodex:
         type_name = key
 
@@ -235,29 +427,19 @@ def SerializedDictionary(key_element_cls, value_element_cls):
 
         @classmethod
         def codex_serialize(cls, x_data):
-            dict_of_serialized = {}
-            key_type_name = type_to_type_name(key_element_cls)
-            value_type_name = type_to_type_name(value_element_cls)
-            for k, v in x_data.items():
-                k_value_serialized = serialize(k, key_type_name).value_serialized
-                v_value_serialized = serialize(v, value_type_name).value_serialized
-                dict_of_serialized[k_value_serialized] = v_value_serialized
-            return str(dict_of_serialized)
+            return str({serialize_key(k): serialize_value(v) for k, v in x_data.items()})
 
         @classmethod
         def codex_deserialize(cls, serialized_data, guild):
-            value_serialized = serialized_data.value_serialized
+            return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
+        @classmethod
+        def codex_deserialize_value(cls, value_serialized, guild):
             dict_of_serialized = ast.literal_eval(value_serialized)
 
             deserialized_dict = SerializedDictionaryType()
             for k_ser, v_ser in dict_of_serialized.items():
-                k_sd = SerializedData(value_serialized=k_ser, type_name=type_to_type_name(key_element_cls))
-                k_deser = deserialize(k_sd, guild)
-
-                v_sd = SerializedData(value_serialized=v_ser, type_name=type_to_type_name(value_element_cls))
-                v_deser = deserialize(v_sd, guild)
-
-                deserialized_dict[k_deser] = v_deser
+                deserialized_dict[deserialize_key(k_ser, guild)] = deserialize_value(v_ser, guild)
 
             return deserialized_dict
 
@@ -274,28 +456,187 @@ def is_serialized_structure(v):
     return v in serialized_structure_types.values()
 
 
+class UnresolvedField:
+    # Stands in for the value of a structure field that hasn't been deserialized yet
+    __slots__ = ("value_serialized",)
+
+    def __init__(self, value_serialized):
+        self.value_serialized = value_serialized
+
+    def __repr__(self):
+        return f"UnresolvedField({self.value_serialized!r})"
+
+
+def parse_structure(value_serialized):
+    try:
+        return {k.strip().lower(): v.strip() for k, v in ast.literal_eval(value_serialized).items()}
+    except Exception:
+        raise SerializationError("Cannot parse this structure, please check your syntax.")
+
+
 def SerializedStructure(structure_name, default_settings):
     structure_name = structure_name.lower()
 
     if structure_name in serialized_structure_types:
         return serialized_structure_types[structure_name]
 
-    class SerializedStructureType(dict):
+    field_type_keys = {field_name: type_name_to_key(kwargs["type_name"])
+                       for field_name, kwargs in default_settings.items()}
+    field_codecs = {}  # field name -> compiled codec, filled on first use as field types may be registered after this
+
+    def get_field_codecs():
+        if not field_codecs:
+            # Only cache a complete map, so a field whose type can't be compiled yet isn't left out for good
+            compiled = {field_name: compile_codec(kwargs["type_name"])
+                        for field_name, kwargs in default_settings.items()}
+            field_codecs.update(compiled)
+        return field_codecs
+
+    class SerializedStructureType(ChangeNotifyingDict):
+        # Fields hold their serialized value until they're first read, so a structure can be loaded without looking
+        # up every role, channel and member it refers to. A value that can't be deserialized any more, like a deleted
+        # role, is logged and read as the field's null value, but saved unchanged.
         def __init__(self, guild):
             super(SerializedStructureType, self).__init__()
+            self.guild = guild
+            self.field_listeners = []  # called with (field_name, value) whenever a field is set
+            self.serialized_fields = {}  # field name -> serialized value, dropped whenever the field changes
+            self.field_caches = {}  # field name -> values computed from the field, dropped whenever the field changes
+            self.dirty = True  # whether anything changed since the owner last serialized this and cleared the flag
             for field_name, kwargs in default_settings.items():
-                serialized_data = SerializedData(**kwargs)
-                super(SerializedStructureType, self).__setitem__(field_name, deserialize(serialized_data, guild))
+                self.set_serialized(field_name, kwargs["value_serialized"])
+
+        @classmethod
+        def from_serialized(cls, value_serialized, guild):
+            struct = cls(guild)
+            for field_name, field_value_serialized in parse_structure(value_serialized).items():
+                if field_name in default_settings:
+                    struct.set_serialized(field_name, field_value_serialized)
+                else:
+                    log.warning(f"Dropping unknown field {field_name} from structure {structure_name}.")
+            return struct
+
+        def set_serialized(self, field_name, value_serialized):
+            super(SerializedStructureType, self).__setitem__(field_name, UnresolvedField(value_serialized))
+            self.serialized_fields[field_name] = value_serialized
+            self.field_caches.pop(field_name, None)
+
+        def resolve(self, field_name, value):
+            if value.__class__ is not UnresolvedField:
+                return value
+
+            _, deserialize_value = get_field_codecs()[field_name]
+            try:
+                resolved = deserialize_value(value.value_serialized, self.guild)
+            except Exception as e:
+                log.warning(f"Can't read {value.value_serialized} as field {field_name} of structure {structure_name}, "
+                            f"using an empty value instead. {e}")
+                # The miss may only be temporary, like a member who isn't cached yet, so the stored value is kept
+                # in serialized_fields and saved as it was until the field is changed
+                resolved = deserialize_value("", self.guild)
+
+            super(SerializedStructureType, self).__setitem__(field_name, resolved)
+            self.watch_field(field_name, resolved)
+            return resolved
+
+        def resolve_all(self):
+            for field_name in list(self.keys()):
+                self.resolve(field_name, super(SerializedStructureType, self).__getitem__(field_name))
+
+        def __getitem__(self, field_name):
+            return self.resolve(field_name, super(SerializedStructureType, self).__getitem__(field_name))
+
+        def __iter__(self):
+            # Overriding __iter__ makes dict(struct) and {**struct} read fields through __getitem__ instead of copying
+            # the stored values, which may still be unresolved
+            return iter(self.keys())
+
+        def get(self, field_name, default=None):
+            if field_name in self:
+                return self[field_name]
+            return default
+
+        def values(self):
+            return [self[field_name] for field_name in self]
+
+        def items(self):
+            return [(field_name, self[field_name]) for field_name in self]
+
+        def copy(self):
+            return dict(self.items())
+
+        def pop(self, field_name, *default):
+            if field_name in self:
+                self[field_name]  # resolves it, so the popped value is never an UnresolvedField
+            return super(SerializedStructureType, self).pop(field_name, *default)
+
+        def popitem(self):
+            self.resolve_all()
+            return super(SerializedStructureType, self).popitem()
+
+        def setdefault(self, field_name, default=None):
+            if field_name not in self:
+                self[field_name] = default
+            return self[field_name]
+
+        def update(self, *args, **kwargs):
+            # Through __setitem__, so every field is type checked and watched
+            for field_name, value in dict(*args, **kwargs).items():
+                self[field_name] = value
+
+        def __ior__(self, other):
+            self.update(other)
+            return self
+
+        def __eq__(self, other):
+            if isinstance(other, dict):
+                return dict(self.items()) == dict(other.items())
+            return NotImplemented
+
+        def __ne__(self, other):
+            equal = self.__eq__(other)
+            return equal if equal is NotImplemented else not equal
+
+        __hash__ = None
+
+        def __repr__(self):
+            return repr(dict(self.items()))
 
         def __setitem__(self, field_name, value):
             if field_name in default_settings:
-                if (value is None) or (value.__class__.__name__.lower() == self.type_name_of(field_name).lower()):
+                if (value is None) or (value.__class__.__name__.lower() == field_type_keys[field_name]):
                     super(SerializedStructureType, self).__setitem__(field_name, value)
+                    self.watch_field(field_name, value)
+                    self.field_changed(field_name)
+                    for listener in self.field_listeners:
+                        listener(field_name, value)
                 else:
                     raise SerializationError(f"Item {value} is not of type {self[field_name].__class__.__name__}.")
             else:
                 raise SerializationError(f"No field called {field_name} in structure {structure_name}.")
 
+        def watch_field(self, field_name, value):
+            # Lists, dictionaries and structures in a field report changes made to them, or to anything in them, in
+            # place
+            if isinstance(value, ChangeNotifying):
+                value.on_change = lambda: self.field_changed(field_name)
+                value.watch_children()
+
+        def watch_children(self):
+            # Fields are watched as they're resolved or set
+            pass
+
+        def field_cache(self, field_name):
+            # A dict for anything worth computing once from the field's value, like a lookup table
+            return self.field_caches.setdefault(field_name, {})
+
+        def field_changed(self, field_name):
+            self.serialized_fields.pop(field_name, None)
+            self.field_caches.pop(field_name, None)
+            self.dirty = True
+            if self.on_change is not None:
+                self.on_change()
+
         @property
         def field_names(self):
             return default_settings.keys()
@@ -310,30 +651,32 @@ def SerializedStructure(structure_name, default_settings):
 
         @classmethod
         def codex_serialize(cls, x_data):
+            # Fields that haven't changed since they were last serialized are taken from the structure's cache
+            serialized_fields = x_data.serialized_fields if isinstance(x_data, SerializedStructureType) else {}
             dict_of_serialized = {}
-            for field_name, kwargs in default_settings.items():
+            for field_name, (serialize_value, _) in get_field_codecs().items():
                 if field_name not in x_data:
                     raise SerializationError(f"{structure_name} structures must have a {field_name} field.")
-                field_value = x_data[field_name]
-                field_value_serialized = serialize(field_value, kwargs["type_name"])
-                dict_of_serialized[field_name] = field_value_serialized.value_serialized
+                if field_name not in serialized_fields:
+                    serialized_fields[field_name] = serialize_value(x_data[field_name])
+                dict_of_serialized[field_name] = serialized_fields[field_name]
 
             return str(dict_of_serialized)
 
         @classmethod
         def codex_deserialize(cls, serialized_data, guild):
-            value_serialized = serialized_data.value_serialized
-            try:
-                dict_of_serialized = {k.strip().lower(): v.strip() for k, v in
-                                      ast.literal_eval(value_serialized).items()}
-            except Exception:
-                raise SerializationError("Cannot parse this structure, please check your syntax.")
+            return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
+        @classmethod
+        def codex_deserialize_value(cls, value_serialized, guild):
+            # Unlike from_serialized this checks every given field straight away
+            dict_of_serialized = parse_structure(value_serialized)
 
+            codecs = get_field_codecs()
             deserialized_struct = SerializedStructureType(guild)
             for field_name, field_value_serialized in dict_of_serialized.items():
-                type_name = default_settings[field_name]["type_name"]
-                field_data_serialized = SerializedData(value_serialized=field_value_serialized, type_name=type_name)
-                deserialized_struct[field_name] = deserialize(field_data_serialized, guild)
+                _, deserialize_value = codecs[field_name]
+                deserialized_struct[field_name] = deserialize_value(field_value_serialized, guild)
 
             return deserialized_struct
 
@@ -351,54 +694,73 @@ class StringCodex:
     def codex_serialize(x_data):
         return x_data
 
+    @classmethod
+    def codex_deserialize(cls, serialized_data, guild):
+        return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
     @staticmethod
-    def codex_deserialize(serialized_data, guild):
-        return serialized_data.value_serialized
+    def codex_deserialize_value(value_serialized, guild):
+        return value_serialized
 
 
 @Codex(int)
 class IntCodex:
     type_name = "int"
+    single_word = True
 
     @staticmethod
     def codex_serialize(x_data):
         return str(x_data)
 
+    @classmethod
+    def codex_deserialize(cls, serialized_data, guild):
+        return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
     @staticmethod
-    def codex_deserialize(serialized_data, guild):
+    def codex_deserialize_value(value_serialized, guild):
         base = 10
-        if serialized_data.value_serialized.startswith("0x"):
+        if value_serialized.startswith("0x"):
             base = 16
-        elif serialized_data.value_serialized.startswith("0b"):
+        elif value_serialized.startswith("0b"):
             base = 2
 
-        return int(serialized_data.value_serialized, base=base)
+        return int(value_serialized, base=base)
 
 
 @Codex(float)
 class FloatCodex:
     type_name = "float"
+    single_word = True
 
     @staticmethod
     def codex_serialize(x_data):
         return str(x_data)
 
+    @classmethod
+    def codex_deserialize(cls, serialized_data, guild):
+        return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
     @staticmethod
-    def codex_deserialize(serialized_data, guild):
-        return float(serialized_data.value_serialized)
+    def codex_deserialize_value(value_serialized, guild):
+        return float(value_serialized)
 
 
 @Codex(bool)
 class BoolCodex:
     type_name = "bool"
+    single_word = True
 
     @staticmethod
     def codex_serialize(x_data):
         return str(x_data)
 
+    @classmethod
+    def codex_deserialize(cls, serialized_data, guild):
+        return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
     @staticmethod
-    def codex_deserialize(serialized_data, guild):
-        sv = serialized_data.value_serialized.lower()
+    def codex_deserialize_value(value_serialized, guild):
+        sv = value_serialized.lower()
         if sv == "true" or sv == "1":
             return True
         elif sv == "false" or sv == "0":
@@ -408,6 +770,11 @@ class BoolCodex:
 
 
 id_regex = re.compile(r'([0-9]{15,21})$')
+member_mention_regex = re.compile(r'<@!?([0-9]+)>$')
+channel_mention_regex = re.compile(r'<#!?([0-9]+)>$')
+role_mention_regex = re.compile(r'<@&([0-9]+)>$')
+custom_emoji_regex = re.compile(r'<a?:[a-zA-Z0-9\_]+:([0-9]+)>$')
+digit_regex = re.compile(r'\d')
 
 
 @Codex(discord.User)
@@ -419,30 +786,27 @@ class MemberCodex:
     def codex_serialize(x_data):
         return x_data.mention
 
+    @classmethod
+    def codex_deserialize(cls, serialized_data, guild):
+        return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
     @staticmethod
-    def codex_deserialize(serialized_data, guild):
-        sv = serialized_data.value_serialized.lower()
-        match = id_regex.match(sv) or re.match(r'<@!?([0-9]+)>$', sv)
+    def codex_deserialize_value(value_serialized, guild):
+        sv = value_serialized.lower()
+        match = id_regex.match(sv) or member_mention_regex.match(sv)
         if match is not None:
             user_id = int(match.group(1))
             member = guild.get_member(user_id)
         else:
             # Not a mention, maybe it's the name of someone
-            potential_discriminator = None
             member = None
             if len(sv) > 5 and sv[-5] == "#":
                 potential_name, potential_discriminator = sv.split("#")
-                if re.search(r'\d', potential_discriminator):
-                    def pred(m):
-                        return m.name.lower() == potential_name and m.discriminator == potential_discriminator
-
-                    member = next((m for m in guild.members if pred(m)), None)
+                if digit_regex.search(potential_discriminator):
+                    member = find_member_by_tag(guild, potential_name, potential_discriminator)
 
             if member is None:
-                def pred(m):
-                    return (m.nick and m.nick.lower()) == sv or m.name.lower() == sv
-
-                member = next((m for m in guild.members if pred(m)), None)
+                member = find_member_by_name(guild, sv)
 
         if member is None:
             raise CodexException(f"Cannot deserialize {sv} into a member.")
@@ -460,16 +824,20 @@ class ChannelCodex:
     def codex_serialize(x_data):
         return x_data.mention
 
+    @classmethod
+    def codex_deserialize(cls, serialized_data, guild):
+        return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
     @staticmethod
-    def codex_deserialize(serialized_data, guild):
-        sv = serialized_data.value_serialized.lower()
-        match = id_regex.match(sv) or re.match(r'<#!?([0-9]+)>$', sv)
+    def codex_deserialize_value(value_serialized, guild):
+        sv = value_serialized.lower()
+        match = id_regex.match(sv) or channel_mention_regex.match(sv)
         if match is not None:
             channel_id = int(match.group(1))
             channel = guild.get_channel(channel_id)
         else:
             # Not a mention
-            channel = next((ch for ch in guild.channels if ch.name.lower() == sv), None)
+            channel = find_channel_by_name(guild, sv)
 
         if channel is None:
             raise CodexException(f"Cannot deserialize {sv} into a channel.")
@@ -484,16 +852,20 @@ class RoleCodex:
     def codex_serialize(x_data):
         return x_data.mention
 
+    @classmethod
+    def codex_deserialize(cls, serialized_data, guild):
+        return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
     @staticmethod
-    def codex_deserialize(serialized_data, guild):
-        sv = serialized_data.value_serialized.lower()
-        match = id_regex.match(sv) or re.match(r'<@&([0-9]+)>$', sv)
+    def codex_deserialize_value(value_serialized, guild):
+        sv = value_serialized.lower()
+        match = id_regex.match(sv) or role_mention_regex.match(sv)
         if match is not None:
             channel_id = int(match.group(1))
             role = guild.get_role(channel_id)
         else:
             # Not a mention
-            role = next((r for r in guild.roles if r.name.lower() == sv), None)
+            role = find_role_by_name(guild, sv)
 
         if role is None:
             raise CodexException(f"Cannot deserialize {sv} into a role.")
@@ -503,18 +875,24 @@ class RoleCodex:
 @Codex(Emoji)
 class EmojiCodex:
     type_name = "Emoji"
+    single_word = True
 
     @staticmethod
     def codex_serialize(x_data):
         return str(x_data)
 
+    @classmethod
+    def codex_deserialize(cls, serialized_data, guild):
+        return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
     @staticmethod
-    def codex_deserialize(serialized_data, guild):
-        sv = serialized_data.value_serialized.lower()
-        match = id_regex.match(sv) or re.match(r'<a?:[a-zA-Z0-9\_]+:([0-9]+)>$', sv)
+    def codex_deserialize_value(value_serialized, guild):
+        sv = value_serialized.lower()
+        match = id_regex.match(sv) or custom_emoji_regex.match(sv)
+        emoji = None
         if match:
             emoji_id = int(match.group(1))
-            dpy_emoji = next((e for e in guild.emojis if e.id == emoji_id), None)
+            dpy_emoji = get_guild_emoji(guild, emoji_id)
             emoji = Emoji(guild_id=guild.id, name=dpy_emoji.name, id=emoji_id,
                           animated=dpy_emoji.animated) if dpy_emoji else None
 
@@ -534,6 +912,10 @@ class TimeDeltaCodex:
     def codex_serialize(x_data):
         return f"{x_data.total_seconds()}s"
 
+    @classmethod
+    def codex_deserialize(cls, serialized_data, guild):
+        return cls.codex_deserialize_value(serialized_data.value_serialized, guild)
+
     @staticmethod
-    def codex_deserialize(serialized_data, guild):
-        return timedelta_from_string(serialized_data.value_serialized)
+    def codex_deserialize_value(value_serialized, guild):
+        return timedelta_from_string(value_serialized)
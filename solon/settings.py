@@ -1,5 +1,6 @@
 from .database import get_data
 from .database import pre_save_all
+from .database import unpin
 from .serialization import SerializedData
 from .serialization import SerializedStructure
 from .serialization import deserialize
@@ -11,7 +12,7 @@ from .core import get_bot
 from .core import SocratesRuntimeError
 
 __all__ = ["get_setting_value", "get_setting_field_names", "set_setting_value", "get_setting_type_name",
-           "get_cogs_with_settings"]
+           "get_cogs_with_settings", "get_settings_view"]
 
 
 class SettingsError(SocratesRuntimeError):
@@ -19,6 +20,27 @@ class SettingsError(SocratesRuntimeError):
 
 
 settings_structures = {}
+settings_views = {}
+settings_savers = {}  # identifier -> function writing the structure back into its database object if it changed
+dotted_keys = {}  # identifier -> dotted field name -> (base field name, deserialized key)
+
+
+class SettingsView:
+    # Read-only attribute access to the settings of one identifier, e.g. view.name_format_has_nick. A field is read
+    # from the settings structure the first time, and kept as a plain attribute after that. The structure pushes
+    # every change of a field to its view, so a read is just an attribute lookup.
+    def __init__(self, settings_structure):
+        self.settings_structure = settings_structure
+
+    def __getattr__(self, field_name):
+        if field_name == "settings_structure":
+            raise AttributeError(field_name)
+        try:
+            value = self.settings_structure[field_name]
+        except KeyError:
+            raise AttributeError(f"There is no setting called {field_name}.")
+        setattr(self, field_name, value)
+        return value
 
 
 def guild_from_identifier(identifier):
@@ -29,43 +51,82 @@ def cog_type_name_from_identifier(identifier):
     return identifier.split(".")[0]
 
 
+def settings_data_identifier(identifier):
+    return f"{__name__}.{identifier}"
+
+
 def create_settings(identifier, default_settings, guild):
     if identifier in settings_structures:
         return settings_structures[identifier]
 
-    struct_name = f"{__name__}.{identifier}"
+    struct_name = settings_data_identifier(identifier)
 
-    struct = SerializedStructure(struct_name, default_settings)(guild)
+    struct_type = SerializedStructure(struct_name, default_settings)
 
     class Data:
         def __init__(self):
-            self.serialized_struct = serialize(struct, struct_name).as_pair
+            self.serialized_struct = serialize(struct_type(guild), struct_name).as_pair
 
-    d = get_data(struct_name, lambda: Data())
+    d = get_data(struct_name, lambda: Data(), pin=True)
 
-    updated_settings_struct = deserialize(SerializedData(**d.serialized_struct), guild)
+    # Fields are only deserialized when they're first read
+    updated_settings_struct = struct_type.from_serialized(d.serialized_struct["value_serialized"], guild)
 
     settings_structures[identifier] = updated_settings_struct
 
-    @pre_save_all
+    view = SettingsView(updated_settings_struct)
+    updated_settings_struct.field_listeners.append(lambda field_name, value: setattr(view, field_name, value))
+    settings_views[identifier] = view
+
     def reserialize_settings():
-        d.serialized_struct = serialize(updated_settings_struct, struct_name).as_pair
+        # Only structures changed since the last save are serialized again, and only their changed fields
+        if updated_settings_struct.dirty:
+            d.serialized_struct = serialize(updated_settings_struct, struct_name).as_pair
+            updated_settings_struct.dirty = False
+
+    settings_savers[identifier] = reserialize_settings
 
     return updated_settings_struct
 
 
+def release_settings(identifier):
+    # Called when the cog owning the settings is unloaded. The structure is written back into its database object,
+    # which is unpinned so it can be evicted, and forgotten, so create_settings reads it again if the cog comes back.
+    if identifier not in settings_structures:
+        return
+
+    settings_savers.pop(identifier)()
+    del settings_structures[identifier]
+    del settings_views[identifier]
+    dotted_keys.pop(identifier, None)
+    unpin(settings_data_identifier(identifier))
+
+
+@pre_save_all
+def reserialize_all_settings():
+    for reserialize_settings in settings_savers.values():
+        reserialize_settings()
+
+
 def get_settings(identifier):
     if identifier not in settings_structures:
         raise SettingsError("Can't find a cog with that name - is it active on this server?")
     return settings_structures[identifier]
 
 
-def get_setting_value(identifier, field_name):
-    settings = get_settings(identifier)
-    if field_name in settings:
-        return settings[field_name]
+def get_settings_view(identifier):
+    if identifier not in settings_views:
+        raise SettingsError("Can't find a cog with that name - is it active on this server?")
+    return settings_views[identifier]
 
-    # could be a member of a dictionary
+
+def get_dotted_key(identifier, field_name):
+    # Returns (base field name, deserialized key) for a field name like dictionary.key, or None if it isn't one
+    identifier_keys = dotted_keys.setdefault(identifier, {})
+    if field_name in identifier_keys:
+        return identifier_keys[field_name]
+
+    dotted_key = None
     if "." in field_name:
         base_field_name, subfield_name = field_name.split(".", 1)
         base_setting = get_setting_value(identifier, base_field_name)
@@ -73,11 +134,24 @@ def get_setting_value(identifier, field_name):
             guild = guild_from_identifier(identifier)
             serialized_data = SerializedData(value_serialized=subfield_name,
                                              type_name=type_to_type_name(base_setting.key_element_class))
-            deserialized_subfield_name = deserialize(serialized_data, guild)
+            dotted_key = (base_field_name, deserialize(serialized_data, guild))
+
+    identifier_keys[field_name] = dotted_key
+    return dotted_key
+
+
+def get_setting_value(identifier, field_name):
+    settings = get_settings(identifier)
+    if field_name in settings:
+        return settings[field_name]
 
-            setting_value = base_setting.get(deserialized_subfield_name, None)
-            if setting_value is not None:
-                return setting_value
+    # could be a member of a dictionary
+    dotted_key = get_dotted_key(identifier, field_name)
+    if dotted_key is not None:
+        base_field_name, key = dotted_key
+        setting_value = settings[base_field_name].get(key, None)
+        if setting_value is not None:
+            return setting_value
 
     raise SettingsError("There is no field with that name.")
 
@@ -108,25 +182,23 @@ def set_setting_value(identifier, field_name, value):
     if value is None:
         value = type_name_to_null_value(get_setting_type_name(identifier, field_name))
 
+    # Keys are deserialized against the guild as it is now, so cached ones are dropped on every change
+    dotted_keys.pop(identifier, None)
+
     if field_name in settings:
         settings[field_name] = value
         return
 
     # could be a member of a dictionary
-    if "." in field_name:
-        base_field_name, subfield_name = field_name.split(".", 1)
-        base_setting = get_setting_value(identifier, base_field_name)
-        if is_serialized_dictionary(base_setting):
-            guild = guild_from_identifier(identifier)
-            serialized_data = SerializedData(value_serialized=subfield_name,
-                                             type_name=type_to_type_name(base_setting.key_element_class))
-            deserialized_subfield_name = deserialize(serialized_data, guild)
-
-            if set_to_null:
-                del base_setting[deserialized_subfield_name]
-            else:
-                base_setting[deserialized_subfield_name] = value
-            return
+    dotted_key = get_dotted_key(identifier, field_name)
+    if dotted_key is not None:
+        base_field_name, key = dotted_key
+        base_setting = settings[base_field_name]
+        if set_to_null:
+            del base_setting[key]
+        else:
+            base_setting[key] = value
+        return
 
     raise SettingsError("There is no field with that name.")
 
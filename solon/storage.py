@@ -0,0 +1,119 @@
+import logging
+import os
+import sqlite3
+import threading
+
+from .core import SocratesStaticError
+
+__all__ = []
+
+log = logging.getLogger(__name__)
+
+backend_builders = {}
+
+
+def backend_builder(func):
+    backend_builders[func.__name__] = func
+    return func
+
+
+class FlatFileBackend:
+    # One file per identifier in a folder. This is the original layout of the database folder.
+
+    def __init__(self, folder):
+        self.folder = folder
+
+        if not os.path.exists(folder):
+            os.mkdir(folder)
+
+        if not os.path.isdir(folder):
+            raise SocratesStaticError(f"os.path.isdir failed on folder {folder}.")
+
+    def load(self, identifier):
+        try:
+            with open(os.path.join(self.folder, identifier), "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    def store_many(self, blobs):
+        for identifier, blob in blobs.items():
+            path = os.path.join(self.folder, identifier)
+            temp_path = f"{path}.tmp"
+            with open(temp_path, "wb") as f:
+                f.write(blob)
+            os.replace(temp_path, path)
+
+    def identifiers(self):
+        return [name for name in os.listdir(self.folder) if not name.endswith(".tmp")]
+
+    def close(self):
+        pass
+
+
+class SqliteBackend:
+    # One row per identifier in a local SQLite database in WAL mode. Every store_many is a single transaction, so a
+    # full save costs one fsync no matter how many objects were dirty.
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()  # saves run on a worker thread, loads on the event loop
+        self.connection = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("CREATE TABLE IF NOT EXISTS data (identifier TEXT PRIMARY KEY, contents BLOB)")
+
+    def load(self, identifier):
+        with self.lock:
+            row = self.connection.execute("SELECT contents FROM data WHERE identifier = ?", (identifier,)).fetchone()
+        return None if row is None else bytes(row[0])
+
+    def store_many(self, blobs):
+        with self.lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.executemany("INSERT OR REPLACE INTO data (identifier, contents) VALUES (?, ?)",
+                                            blobs.items())
+            except Exception:
+                self.connection.execute("ROLLBACK")
+                raise
+            self.connection.execute("COMMIT")
+
+    def identifiers(self):
+        with self.lock:
+            return [row[0] for row in self.connection.execute("SELECT identifier FROM data")]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+@backend_builder
+def flat_file(folder, _):
+    return FlatFileBackend(folder)
+
+
+@backend_builder
+def sqlite(folder, params):
+    # Lives next to the database folder rather than in it, so the folder can still be migrated from
+    return SqliteBackend(params.get("filename", f"{folder}.sqlite3"))
+
+
+def parse_backend(folder, d):
+    if len(d) != 1:
+        raise SocratesStaticError(f"Exactly one database backend must be configured, not {list(d.keys())}.")
+    func_name, params = next(iter(d.items()))
+    if func_name not in backend_builders:
+        raise SocratesStaticError(f"I don't recognise the database backend {func_name}.")
+    return backend_builders[func_name](folder, params)
+
+
+def migrate(source, destination):
+    blobs = {}
+    for identifier in source.identifiers():
+        blob = source.load(identifier)
+        if blob is not None:
+            blobs[identifier] = blob
+    destination.store_many(blobs)
+    log.info(f"Migrated {len(blobs)} objects.")
+    return len(blobs)
+
@@ -1,10 +1,12 @@
 import asyncio
-import calendar
-import datetime
+import heapq
+import itertools
 import logging
 import inspect
+import time
 import traceback
 import weakref
+import zlib
 
 from .config import get_config
 from .core import DynamicNameCollisionError
@@ -12,6 +14,7 @@ from .core import IncorrectSignatureError
 from .core import NotACoroutineError
 from .core import timedelta_from_string
 from .database import get_data
+from .database import set_data_item
 
 __all__ = ["start_timed_event_loop", "TimedEvent"]
 
@@ -21,6 +24,9 @@ config = get_config(__name__)
 log.info(f"Loading {__name__}")
 
 sleep_interval = timedelta_from_string(config["sleep_interval"])
+max_concurrent_events = config.get("max_concurrent_events", 8)  # None for no limit
+default_event_timeout = config.get("event_timeout", None)  # e.g. "5m". None for no timeout
+max_dispatch_per_second = config.get("max_dispatch_per_second", None)  # None for no limit
 
 
 class Data:
@@ -28,41 +34,151 @@ class Data:
         self.last_updated_timestamp = {}  # key -> UNIX timestamp of last time event called
 
 
-data = get_data(__name__, lambda: Data())
+data = get_data(__name__, lambda: Data(), pin=True)
 
 timed_events = {}  # key -> (weakref(obj), callback, properties, timedelta)
+schedule = []  # heap of (due timestamp, sequence number, key)
+scheduled_due = {}  # key -> due timestamp of its live entry in schedule. Other entries for that key are stale.
+schedule_sequence = itertools.count()  # tie breaker, so keys never need comparing
+wakeup = None  # asyncio.Event set when an event is started, so the loop can recompute how long to sleep
+concurrency_limiter = None  # asyncio.Semaphore shared by all events, if max_concurrent_events is set
+event_limiters = {}  # key -> asyncio.Semaphore allowing max_concurrency concurrent runs of that event
+running_counts = {}  # key -> number of runs of that event that are running or waiting to run
+running_tasks = set()
+phase_offsets = {}  # key -> seconds, for events started with spread=True
+
+
+class DispatchRateLimiter:
+    # Token bucket allowing rate dispatches per second, in bursts of at most rate. The bucket always holds at least
+    # one token, so rates below 1 (e.g. 0.5 for one dispatch every two seconds) still dispatch.
+    def __init__(self, rate):
+        self.rate = rate
+        self.capacity = max(1, rate)
+        self.tokens = self.capacity
+        self.updated = time.time()
+
+    def available(self, now):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        return int(self.tokens)
+
+    def take(self, count):
+        self.tokens -= count
+
+    def time_until_available(self):
+        return max(0.0, (1 - self.tokens) / self.rate)
+
+
+rate_limiter = None if max_dispatch_per_second is None else DispatchRateLimiter(max_dispatch_per_second)
+
+
+def phase_offset(key, interval):
+    # Deterministic, so a key lands on the same point of its interval after every restart
+    return zlib.crc32(key.encode("utf-8")) / 2 ** 32 * interval
+
+
+def schedule_event(key):
+    due = data.last_updated_timestamp[key] + timed_events[key][3].total_seconds()
+    if key in phase_offsets:
+        # Overdue events (e.g. after a restart) would otherwise all become due on the same tick
+        due = max(due, time.time() + phase_offsets[key])
+    scheduled_due[key] = due
+    heapq.heappush(schedule, (due, next(schedule_sequence), key))
+    if wakeup is not None:
+        wakeup.set()
+
+
+def pop_due_events(now, limit=None):
+    keys = []
+    while schedule and schedule[0][0] <= now and (limit is None or len(keys) < limit):
+        due, _, key = heapq.heappop(schedule)
+        if scheduled_due.get(key) == due:
+            del scheduled_due[key]
+            keys.append(key)
+    return keys
+
+
+def dispatch_event(key, now):
+    obj_ref, callback, properties, timedelta = timed_events[key]
+    obj = obj_ref()
+    if obj is None or (hasattr(obj, "active") and not obj.active):
+        del timed_events[key]
+        return
+
+    # we assume obj is a cog. It might not have an active attribute if it's still
+    # being constructud. In this case, we do not call until construction has finished.
+    # We only call on active cogs.
+    if hasattr(obj, "active") and obj.active:
+        max_concurrency = properties.get("max_concurrency", 1)
+        if running_counts.get(key, 0) >= max_concurrency and properties.get("skip_if_running", True):
+            log.warning(f"Skipping timed event {key} because it's still running from last time.")
+        else:
+            log.info(f"Hit timed event {key}.")
+            if key not in event_limiters:
+                event_limiters[key] = asyncio.Semaphore(max_concurrency)
+            running_counts[key] = running_counts.get(key, 0) + 1
+            task = asyncio.ensure_future(run_event(key, obj, callback, properties))
+            running_tasks.add(task)
+            task.add_done_callback(running_tasks.discard)
+
+    set_data_item(data, "last_updated_timestamp", key, now)
+    schedule_event(key)
+
+
+async def run_event(key, obj, callback, properties):
+    timeout = properties.get("timeout", default_event_timeout)
+    if isinstance(timeout, str):
+        timeout = timedelta_from_string(timeout).total_seconds()
+
+    try:
+        async with event_limiters[key]:
+            if concurrency_limiter is not None:
+                async with concurrency_limiter:
+                    await asyncio.wait_for(callback(obj), timeout)
+            else:
+                await asyncio.wait_for(callback(obj), timeout)
+
+    except asyncio.TimeoutError:
+        log.error(f"Timed event {key} timed out after {timeout} seconds.")
+
+    except Exception as e:
+        trace = traceback.format_exc()
+        log.error(f"{e}\n{trace}")
+
+    finally:
+        running_counts[key] -= 1
 
 
 async def loop_function():
-    global timed_events
+    global wakeup, concurrency_limiter
+    wakeup = asyncio.Event()
+    if max_concurrent_events is not None:
+        concurrency_limiter = asyncio.Semaphore(max_concurrent_events)
+
     while True:
-        dead_objects = []
-        now = datetime.datetime.utcnow()
-        for key, (obj_ref, callback, properties, timedelta) in timed_events.items():
-            last_updated_time = datetime.datetime.utcfromtimestamp(data.last_updated_timestamp[key])
-            if (now - last_updated_time) > timedelta:
-                try:
-                    obj = obj_ref()
-                    if obj is None or (hasattr(obj, "active") and not obj.active):
-                        dead_objects.append(key)
-                    else:
-                        # we assume obj is a cog. It might not have an active attribute if it's still
-                        # being constructud. In this case, we do not call until construction has finished.
-                        # We only call on active cogs.
-                        if hasattr(obj, "active") and obj.active:
-                            log.info(f"Hit timed event {key}.")
-                            await callback(obj)
-
-                except Exception as e:
-                    trace = traceback.format_exc()
-                    log.error(f"{e}\n{trace}")
-
-                data.last_updated_timestamp[key] = calendar.timegm(now.timetuple())
-
-        if len(dead_objects) > 0:
-            timed_events = {k: v for k, v in timed_events.items() if k not in dead_objects}
-
-        await asyncio.sleep(sleep_interval.total_seconds())
+        now = time.time()
+        if rate_limiter is None:
+            keys = pop_due_events(now)
+        else:
+            keys = pop_due_events(now, rate_limiter.available(now))
+            rate_limiter.take(len(keys))
+
+        for key in keys:
+            dispatch_event(key, now)
+
+        # Sleep until the next event is due, or until start() adds one that might be due sooner. sleep_interval caps
+        # the sleep so we never oversleep much if the clock jumps.
+        timeout = sleep_interval.total_seconds()
+        if schedule:
+            timeout = max(0.0, min(timeout, schedule[0][0] - time.time()))
+            if rate_limiter is not None and schedule[0][0] <= now:
+                # Events left over because we hit max_dispatch_per_second
+                timeout = rate_limiter.time_until_available()
+        wakeup.clear()
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            pass
 
 
 def start_timed_event_loop(loop):
@@ -70,6 +186,10 @@ def start_timed_event_loop(loop):
     asyncio.ensure_future(loop_function(), loop=loop)
 
 
+def is_alive(obj):
+    return obj is not None and (not hasattr(obj, "active") or obj.active)
+
+
 class TimedEventFunction:
     def __init__(self, callback, properties):
         if not inspect.iscoroutinefunction(callback):
@@ -81,28 +201,44 @@ class TimedEventFunction:
         self.callback = callback
         self.properties = properties
 
-    def start(self, obj, timedelta, *, run_at_start=False):
-        key = f"{type(obj).__name__}.{self.callback.__name__}"
-        if key in timed_events:
+    def key(self, obj):
+        # Cogs share their class between guilds when cog_instantiation is "shared", so prefer the identifier
+        return f"{getattr(obj, 'identifier', type(obj).__name__)}.{self.callback.__name__}"
+
+    def start(self, obj, timedelta, *, run_at_start=False, spread=False):
+        # spread=True moves the event to a fixed, key-dependent point in its interval whenever it would be overdue,
+        # so many events started with the same interval don't all fall due together.
+        key = self.key(obj)
+        if key in timed_events and is_alive(timed_events[key][0]()):
             raise DynamicNameCollisionError(f"There is already a timed event by key {key} running.")
 
         if key not in data.last_updated_timestamp:
             # Most of the time a newly registered looping function won't be due, and we don't want first-run
             # behaviour to be different for no reason. However, we allow this to be overridden with a parameter.
             if run_at_start:
-                data.last_updated_timestamp[key] = 0
+                set_data_item(data, "last_updated_timestamp", key, 0)
+            elif spread:
+                set_data_item(data, "last_updated_timestamp", key, time.time() - timedelta.total_seconds())
             else:
-                now = datetime.datetime.utcnow()
-                data.last_updated_timestamp[key] = now.timestamp()
+                set_data_item(data, "last_updated_timestamp", key, time.time())
 
         timed_events[key] = (weakref.ref(obj), self.callback, self.properties, timedelta)
+        if spread:
+            phase_offsets[key] = phase_offset(key, timedelta.total_seconds())
+        else:
+            phase_offsets.pop(key, None)
+        schedule_event(key)
 
     def is_running(self, obj):
-        key = f"{type(obj).__name__}.{self.callback.__name__}"
+        key = self.key(obj)
         return key in timed_events
 
 
 def TimedEvent(**kwargs):
+    # Supported properties:
+    #   max_concurrency - how many runs of the same event may overlap (default 1)
+    #   skip_if_running - skip a run when max_concurrency runs are still going, instead of queueing it (default True)
+    #   timeout - seconds, or a string like "5m", after which a run is cancelled (default: event_timeout in config)
     def wrapper(func):
         return TimedEventFunction(func, kwargs)
 
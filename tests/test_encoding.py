@@ -0,0 +1,27 @@
+import unittest
+
+from solon.encoding import decode
+from solon.encoding import encode
+
+
+class TestJsonFormat(unittest.TestCase):
+    def round_trip(self, v):
+        return decode(encode(v, "json"))
+
+    def test_tagged_types(self):
+        v = {"ints": {1: "a", 2: ("b", 3)}, "mixed": {"x": 1, 2: [4, 5]}, "set": {6, 7}, "tuple": (8, {9})}
+        self.assertEqual(self.round_trip(v), v)
+
+    def test_tags_as_keys(self):
+        for tag in ["__int_keys__", "__items__", "__tuple__", "__set__"]:
+            v = {tag: [1, 2]}
+            self.assertEqual(self.round_trip(v), v)
+            self.assertEqual(self.round_trip({"outer": v, tag: {tag: "x"}}), {"outer": v, tag: {tag: "x"}})
+
+    def test_tag_keys_in_items(self):
+        v = {"__set__": {"__tuple__": (1,)}, 3: {"__items__": []}}
+        self.assertEqual(self.round_trip(v), v)
+
+
+if __name__ == "__main__":
+    unittest.main()
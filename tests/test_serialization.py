@@ -0,0 +1,75 @@
+import unittest
+
+from types import SimpleNamespace
+
+from solon.serialization import SerializationError
+from solon.serialization import SerializedData
+from solon.serialization import SerializedList
+from solon.serialization import deserialize
+from solon.serialization import get_codex
+from solon.serialization import serialize
+
+import discord
+
+IntList = SerializedList(int)
+StrList = SerializedList(str)
+RoleList = SerializedList(discord.Role)
+
+
+class FakeGuild:
+    # Just enough of a discord.Guild for role lookups
+    def __init__(self, role_names):
+        self.id = 1
+        self.roles = [SimpleNamespace(id=100 + i, name=name) for i, name in enumerate(role_names)]
+
+    def get_role(self, role_id):
+        return next((role for role in self.roles if role.id == role_id), None)
+
+
+def deserialize_list(list_type, value_serialized, guild=None):
+    return list(deserialize(SerializedData(value_serialized=value_serialized, type_name=list_type.__name__), guild))
+
+
+class TestSerializedList(unittest.TestCase):
+    def test_bracketed(self):
+        self.assertEqual(deserialize_list(IntList, "['1', '2']"), [1, 2])
+        self.assertEqual(deserialize_list(IntList, " [ '1' , \"2\", ] "), [1, 2])
+        self.assertEqual(deserialize_list(IntList, "[]"), [])
+        self.assertEqual(deserialize_list(StrList, "['a b', \"it's\"]"), ["a b", "it's"])
+
+    def test_round_trip(self):
+        values = ["a", "it's", 'q"q', "back\\slash", "a, b", "[a]"]
+        serialized = serialize(StrList(values), StrList.__name__)
+        self.assertEqual(deserialize(serialized, None), values)
+
+    def test_whole_value_as_single_element(self):
+        self.assertEqual(deserialize_list(StrList, "hello world"), ["hello world"])
+        self.assertEqual(deserialize_list(StrList, "[a]"), ["[a]"])
+        self.assertEqual(deserialize_list(IntList, "7"), [7])
+
+        guild = FakeGuild(["Moderator Team", "Moderator", "Team"])
+        self.assertEqual([role.id for role in deserialize_list(RoleList, "Moderator Team", guild)], [100])
+
+    def test_split_by_whitespace(self):
+        self.assertEqual(deserialize_list(IntList, "1 2  3"), [1, 2, 3])
+
+        guild = FakeGuild(["Moderator", "Helper"])
+        self.assertEqual([role.id for role in deserialize_list(RoleList, "moderator helper", guild)], [100, 101])
+
+    def test_errors(self):
+        for list_type, value_serialized in [(IntList, "1 x 3"), (IntList, "['1', 'x']"), (IntList, "['1' '2']"),
+                                            (IntList, "x")]:
+            with self.assertRaises(SerializationError):
+                deserialize_list(list_type, value_serialized)
+
+
+class TestCodexDeserialize(unittest.TestCase):
+    def test_built_in_codices_take_serialized_data(self):
+        cases = [("int", "0x10", 16), ("bool", "true", True), ("str", "a b", "a b"), (IntList.__name__, "1 2", [1, 2])]
+        for type_name, value_serialized, expected in cases:
+            serialized_data = SerializedData(value_serialized=value_serialized, type_name=type_name)
+            self.assertEqual(get_codex(type_name).codex_deserialize(serialized_data, None), expected)
+
+
+if __name__ == "__main__":
+    unittest.main()
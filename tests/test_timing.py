@@ -0,0 +1,30 @@
+import unittest
+
+from solon.timing import DispatchRateLimiter
+
+
+class TestDispatchRateLimiter(unittest.TestCase):
+    def test_burst_is_capped_at_rate(self):
+        limiter = DispatchRateLimiter(5)
+        now = limiter.updated + 60
+        self.assertEqual(limiter.available(now), 5)
+        limiter.take(5)
+        self.assertEqual(limiter.available(now), 0)
+        self.assertAlmostEqual(limiter.time_until_available(), 0.2)
+
+    def test_rate_below_one_dispatches(self):
+        limiter = DispatchRateLimiter(0.5)
+        now = limiter.updated
+        self.assertEqual(limiter.available(now), 1)
+        limiter.take(1)
+        self.assertEqual(limiter.available(now + 1), 0)
+        self.assertAlmostEqual(limiter.time_until_available(), 1.0)
+        self.assertEqual(limiter.available(now + 2), 1)
+
+    def test_rate_below_one_does_not_burst(self):
+        limiter = DispatchRateLimiter(0.25)
+        self.assertEqual(limiter.available(limiter.updated + 3600), 1)
+
+
+if __name__ == "__main__":
+    unittest.main()